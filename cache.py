@@ -0,0 +1,136 @@
+# Copyright (c) 2024 Lukas Heindl
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import hashlib
+import os
+import msgpack
+from pyformlang.cfg import CFG, Production, Variable, Terminal, Epsilon as CfgEpsilon
+from pyformlang.finite_automaton import EpsilonNFA, State, Symbol, Epsilon as FaEpsilon
+
+# part of every cache key, bump this if the format of dumpCompiled changes
+TOOL_VERSION = "2"
+
+def defaultDir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "theoTool")
+
+# persistent cache of the compiled artifacts of an element (see
+# Ele.dumpCompiled) keyed by the content of the input file. The least
+# recently used entries are evicted as soon as maxBytes is exceeded.
+class Cache:
+    def __init__(self, directory:str=None, maxBytes:int=64*1024*1024):
+        self.directory = defaultDir() if directory is None else directory
+        self.maxBytes  = maxBytes
+
+    def key(self, path:str, kind:str) -> str:
+        h = hashlib.sha256()
+        h.update(TOOL_VERSION.encode())
+        h.update(b"\0" + kind.encode() + b"\0")
+        with open(path, 'rb') as f:
+            h.update(f.read())
+        return h.hexdigest()
+
+    def _path(self, key:str) -> str:
+        return os.path.join(self.directory, key + ".msgpack")
+
+    def load(self, key:str):
+        try:
+            with open(self._path(key), 'rb') as f:
+                d = msgpack.unpackb(f.read(), raw=False, strict_map_key=False)
+            os.utime(self._path(key)) # mark as recently used
+            return d
+        except (OSError, ValueError, msgpack.UnpackException):
+            return None
+
+    def store(self, key:str, d:dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(key) + ".%d.tmp" % os.getpid()
+        with open(tmp, 'wb') as f:
+            f.write(msgpack.packb(d, use_bin_type=True))
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for fi in os.listdir(self.directory):
+            if not fi.endswith(".msgpack"):
+                continue
+            st = os.stat(os.path.join(self.directory, fi))
+            entries.append((st.st_mtime, st.st_size, fi))
+        total = sum(e[1] for e in entries)
+        for _,size,fi in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            os.remove(os.path.join(self.directory, fi))
+            total -= size
+
+    # restores the compiled artifacts of ele from the cache or compiles ele
+    # and stores them
+    def attach(self, ele, path:str, kind:str):
+        key = self.key(path, kind)
+        d = self.load(key)
+        if d is not None:
+            ele.loadCompiled(d)
+            return
+        ele.compile()
+        self.store(key, ele.dumpCompiled())
+
+# (de)serialization of the pyformlang objects into msgpack compatible types
+def _value(v):
+    return v if isinstance(v, (str, int)) else str(v)
+
+def _dumpCfgObj(x) -> list:
+    return [type(x).__name__, _value(x.value)]
+
+def _loadCfgObj(x):
+    kind, value = x
+    if kind == "Variable":
+        return Variable(value)
+    if kind == "Terminal":
+        return Terminal(value)
+    return CfgEpsilon()
+
+def dumpCfg(cfg:CFG) -> dict:
+    return {"start": _dumpCfgObj(cfg.start_symbol),
+            "prods": [[_dumpCfgObj(p.head), [_dumpCfgObj(x) for x in p.body]] for p in cfg.productions]}
+
+def loadCfg(d:dict) -> CFG:
+    start = _loadCfgObj(d["start"])
+    prods = [Production(_loadCfgObj(h), [_loadCfgObj(x) for x in b]) for h,b in d["prods"]]
+    variables = {start} | {p.head for p in prods} | {x for p in prods for x in p.body if isinstance(x, Variable)}
+    terminals = {x for p in prods for x in p.body if isinstance(x, Terminal) and not isinstance(x, CfgEpsilon)}
+    return CFG(variables=variables, terminals=terminals, start_symbol=start, productions=prods)
+
+def dumpEnfa(enfa:EpsilonNFA) -> dict:
+    return {"start": [_value(s.value) for s in enfa.start_states],
+            "final": [_value(s.value) for s in enfa.final_states],
+            "delta": [[_value(src.value), None if sym == FaEpsilon() else _value(sym.value), _value(dst.value)]
+                      for src,sym,dst in enfa._transition_function.get_edges()]}
+
+def loadEnfa(d:dict) -> EpsilonNFA:
+    enfa = EpsilonNFA()
+    for src,sym,dst in d["delta"]:
+        enfa.add_transition(State(src), FaEpsilon() if sym is None else Symbol(sym), State(dst))
+    for s in d["start"]:
+        enfa.add_start_state(State(s))
+    for s in d["final"]:
+        enfa.add_final_state(State(s))
+    return enfa
@@ -18,19 +18,91 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
 import yaml
+import shutil
+import tempfile
 from ele import Ele
-from pyformlang.cfg import CFG, Terminal
+from pyformlang.cfg import CFG, Terminal, Epsilon
 from pyformlang.cfg.cyk_table import CYKTable, DerivationDoesNotExist
 from pyformlang.cfg.parse_tree import ParseTree
 from terminaltables import SingleTable
+from cache import dumpCfg, loadCfg
+from cykLib import CYK
+from earleyLib import Earley
+from langLib import CnfLanguage
 
 class Cfg(Ele):
+    cacheable = True
+
     def __init__(self, cfg:CFG, checks:list[str]):
         super().__init__(terminals=list(map(lambda x: x.value, cfg.terminals)), checks=checks)
         self.cfg = cfg
-        self.ts = []
+        # derived once by compile (or loaded from the cache) and reused for
+        # every word: the CNF, its CYK lookup tables and if $ is generated
+        self.cnf = None
+        self.engine = None
+        self.epsilon = False
+        # 'cyk' works on the CNF, 'earley' directly on the productions
+        self.parser = "cyk"
+        self.earley = None
+        self.compiled = False
+        # tex pages (syntax tree and derivation) of the simulated words, spooled
+        # to a temporary file instead of kept in memory (see toTikz)
+        self.pages = None
         self.cyk_on_sim = False
+        # printed CYK tables only show the diagonals of the symbols after the
+        # prefix shared with the previously printed word
+        self.cyk_incremental = False
+        self.cykWord = ""
+        self.cykMasks = []
+
+    def compile(self):
+        self.epsilon = self.cfg.generate_epsilon()
+        if self.parser == "earley":
+            self.earley = Earley(self.cfg)
+        else:
+            self.compileCnf()
+        self.compiled = True
+
+    def compileCnf(self):
+        self.cnf = self.cfg.to_normal_form()
+        self.engine = CYK(self.cnf)
+
+    # the words are derived from the CNF (also built in earley mode)
+    def language(self) -> CnfLanguage:
+        if not self.compiled:
+            self.compile()
+        if self.cnf is None:
+            self.compileCnf()
+        return CnfLanguage(self.cnf, self.epsilon, self.terminals, self.contains)
+
+    def dumpCompiled(self) -> dict:
+        if not self.compiled:
+            self.compile()
+        if self.parser == "earley":
+            return {"epsilon": self.epsilon}
+        return {"cnf": dumpCfg(self.cnf), "epsilon": self.epsilon}
+
+    def loadCompiled(self, d:dict):
+        self.epsilon = d["epsilon"]
+        if self.parser == "earley":
+            self.earley = Earley(self.cfg)
+        else:
+            self.cnf = loadCfg(d["cnf"])
+            self.cfg._normal_form = self.cnf # pyformlang uses this for contains etc.
+            self.engine = CYK(self.cnf)
+        self.compiled = True
+
+    # membership only (no syntax tree, nothing is recorded)
+    def contains(self, i:str) -> bool:
+        if not self.compiled:
+            self.compile()
+        if self.parser == "earley":
+            return self.earley.accepts(self.earley.chart(i))
+        if i == "":
+            return self.epsilon
+        return self.engine.accepts(self.engine.prefixTable(i))
 
     @classmethod
     def loadYaml(cls, fi:str, verbose:int):
@@ -53,15 +125,46 @@ class Cfg(Ele):
 
         return Cfg(cfg, checks=checks)
 
+    def spool(self):
+        if self.pages is None:
+            self.pages = tempfile.TemporaryFile(mode="w+")
+        return self.pages
+
+    # the pages written since the last call (removed from the spool)
+    def takeState(self) -> list:
+        if self.pages is None:
+            return []
+        self.pages.seek(0)
+        pages = self.pages.read()
+        self.pages.seek(0)
+        self.pages.truncate()
+        return [pages]
+
+    def mergeState(self, state:list):
+        for pages in state:
+            self.spool().write(pages)
+
     # returns (accepted,texTree,leftDeriv)
+    # the syntax tree is in CNF unless the earley parser is used
     def simulate(self, i:str):
-        l = [c for c in i]
-        accepted = self.cfg.contains(l)
+        if not self.compiled:
+            self.compile()
+        if self.parser == "earley":
+            chart = self.earley.chart(i)
+            accepted = self.earley.accepts(chart)
+            forr = self.earley.parseTree(i, chart) if accepted else None
+        elif i == "":
+            accepted = self.epsilon
+            forr = ParseTree(self.cnf.start_symbol)
+            forr.sons = [ParseTree(Epsilon())]
+        else:
+            tab = self.engine.prefixTable(i)
+            accepted = self.engine.accepts(tab)
+            forr = self.engine.parseTree(i, tab) if accepted else None
         r = ([],[])
         if accepted:
-            forr = self.cfg.get_cnf_parse_tree(l)
-            r = (self.ablForest(forr, 0), forr.get_leftmost_derivation())
-        self.ts.append((i,r[0],r[1]))
+            r = (self.ablForest(forr, 0), self.leftmostDerivation(forr))
+        self.writePage(self.spool(), i, r[0], r[1])
         if self.cyk_on_sim:
             self.cyk(i)
         return accepted,[],r[1]
@@ -80,25 +183,43 @@ class Cfg(Ele):
             else:
                 print(prod.head.value, "&" , " ".join(list(map(lambda x: x.value, prod.body))), r"\\", file=f)
         print(r"\end{array}$\end{page}", file=f)
-        for string,tree,derivation in self.ts:
-            print(r"\begin{page}", file=f)
-            print("Wort: " + string + "\n", file=f)
-            print(r"{\centering\begin{forest}", file=f)
-            print(r"where n children=0{fill=pink,rectangle,draw}{}", file=f)
-            print("[", file=f)
-            for l in tree:
-                print(l, file=f)
-            print("]", file=f)
-            print(r"\end{forest}\par}\vspace*{\spaceAbl}" + "\n\nLinksableitung:\n", file=f)
-            for d in derivation:
-                print(str(d).replace("#", "-") + r"\\[0cm]", file=f)
-            print(r"\end{page}", file=f)
+        if self.pages is not None:
+            self.pages.seek(0)
+            shutil.copyfileobj(self.pages, f)
+            self.pages.seek(0, 2)
         print(r"\end{document}", file=f)
         return True
 
+    # writes the page of a simulated word
+    def writePage(self, f, string:str, tree:list, derivation:list):
+        print(r"\begin{page}", file=f)
+        print("Wort: " + string + "\n", file=f)
+        print(r"{\centering\begin{forest}", file=f)
+        print(r"where n children=0{fill=pink,rectangle,draw}{}", file=f)
+        print("[", file=f)
+        for l in tree:
+            print(l, file=f)
+        print("]", file=f)
+        print(r"\end{forest}\par}\vspace*{\spaceAbl}" + "\n\nLinksableitung:\n", file=f)
+        for d in derivation:
+            print(str(d).replace("#", "-") + r"\\[0cm]", file=f)
+        print(r"\end{page}", file=f)
+
+    # sentential forms of the leftmost derivation of tree (epsilon leaves
+    # vanish, get_leftmost_derivation of pyformlang mishandles them)
+    def leftmostDerivation(self, tree:ParseTree) -> list[list]:
+        forms = [[tree]]
+        while True:
+            cur = forms[-1]
+            k = next((k for k,t in enumerate(cur) if t.sons), None)
+            if k is None:
+                break
+            forms.append(cur[:k] + [s for s in cur[k].sons if not isinstance(s.value, Epsilon)] + cur[k+1:])
+        return [[t.value for t in f] for f in forms]
+
     def ablForest(self,tree:ParseTree, lvl:int):
         acc = []
-        acc.append(str(tree.value).replace("#", "-"))
+        acc.append(r"\$" if isinstance(tree.value, Epsilon) else str(tree.value).replace("#", "-"))
         for s in tree.sons:
             acc.append("    "*lvl + "[")
             acc += self.ablForest(s, lvl+1)
@@ -109,49 +230,59 @@ class Cfg(Ele):
         print("cfg does no toDot()")
         return False
 
-    def cyk_check(self, a, b, cfg):
-        ret = []
-        for p in cfg.productions:
-            if len(p.body) == 2:
-                if p.body[0] == a and p.body[1] == b:
-                    ret.append(p.head)
-        return ret
-
-    def cyk_init(self, a, cfg):
-        ret = set()
-        for p in cfg.productions:
-            if len(p.body) == 1:
-                if p.body[0] == a:
-                    ret.add(p.head)
-        return ret
-
     def cyk(self, s:str):
-        cfg = self.cfg.to_normal_form()
-        print(cfg.to_text())
-        tab = [[Terminal(x) for x in s]]
-        new = [[self.cyk_init(x, cfg) for x in y] for y in tab]
-        tab = new + tab # tab is the existing table and new is the set of step1 since the elements are simply printed, it is no problem that one contains a set and one only literals
+        if self.engine is None:
+            self.compileCnf()
+        eng = self.engine
+        print(self.cnf.to_text())
+        if self.cyk_incremental:
+            self.cykIncremental(s)
+            return
+        masks = [[eng.termHeads.get(x, 0) for x in s]]
+        tab = [[eng.sets(m) for m in masks[0]], [Terminal(x) for x in s]] # the terminal line is only printed
         while len(tab[0])-1 >= 1: # go lines up
             tabNewLine = []
+            maskNewLine = []
             print()
             self.cyk_tabToString(tab, "Step")
             for i in range(len(tab[0]) - 1): # go over cells
-                new = set()
+                new = 0
                 b_i = 1
-                for a,b in zip(tab[-2::-1],tab):
+                for a,b in zip(masks[::-1],masks):
                     cellA = a[i]
                     cellB = b[i+b_i]
-                    print("checking:\n a", cellA, "\n b", cellB, end="\n -> ")
-                    for ax in cellA:
-                        for bx in cellB:
-                            new = new.union(self.cyk_check(ax,bx, cfg))
-                    print(new)
+                    print("checking:\n a", eng.sets(cellA), "\n b", eng.sets(cellB), end="\n -> ")
+                    new |= eng.combine(cellA, cellB)
+                    print(eng.sets(new))
                     b_i += 1
-                tabNewLine.append(new)
+                maskNewLine.append(new)
+                tabNewLine.append(eng.sets(new))
+            masks = [maskNewLine] + masks
             tab = [tabNewLine] + tab
         print("\n")
         self.cyk_tabToString(tab, "Final")
     
+    def cykIncremental(self, s:str):
+        eng = self.engine
+        p = len(os.path.commonprefix([self.cykWord, s]))
+        eng.truncate(self.cykMasks, p)
+        if p > 0:
+            print("\nreusing the table of", s[:p])
+        def onCell(l, i, cellA, cellB, new):
+            print("checking:\n a", eng.sets(cellA), "\n b", eng.sets(cellB), end="\n -> ")
+            print(eng.sets(new))
+        def onSymbol(j):
+            print()
+            self.cyk_tabToString(self.cykSets(s[:j+1]), "Step")
+        eng.extend(s, self.cykMasks, p, onCell, onSymbol)
+        self.cykWord = s
+        print("\n")
+        self.cyk_tabToString(self.cykSets(s), "Final")
+
+    # printable table of the masks (longest span on top, terminals at the bottom)
+    def cykSets(self, s:str) -> list[list]:
+        return [[self.engine.sets(m) for m in row] for row in reversed(self.cykMasks)] + [[Terminal(x) for x in s]]
+
     def cyk_tabToString(self, tab, title):
         tableString = [[str(x) for x in y] for y in tab]
         st = SingleTable(tableString, title=title)
@@ -165,4 +296,4 @@ class Cfg(Ele):
 if __name__ == "__main__":
     c = Cfg.loadYaml("./projects/cykTesting/h71b.yaml", 0)
     print(c.cyk("zszwz"))
-    print(c.cfg.contains("abaa"))
+    print(c.contains("abaa"))
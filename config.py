@@ -25,6 +25,8 @@ import random
 import itertools
 
 from pyformlang.cfg import CFG
+from cfg import Cfg
+from ele import Words, uniqueConcat
 # only in effect if --check is set
 # specifies if a word should be considered as (in)correct
 # can help to automatically check an automata
@@ -35,7 +37,7 @@ def abEx(i:str):
     ret = len(re.findall("ab", i)) == len(re.findall('ba', i))
     return ret
 
-cfg = CFG.from_text("S -> a b")
+cfg = Cfg(CFG.from_text("S -> a b"), checks=[])
 def cfgContain(i:str):
     return cfg.contains(i)
 
@@ -57,12 +59,16 @@ def checkL_pda (i:str, s:tuple) -> bool:
 def checkL_cfg (i:str, s:tuple) -> bool:
     return True
 
-# s : (accepted:bool,return of TM lib,[])
+# s : (accepted:bool,return of TM lib,stats)
 # return of TM lib: is a TM (use .tapes to get the tapes and .state to get the final state)
+# stats: dict, 'explored' -> amount of configurations explored
+# (undecided words, e.g. the step budget was exhausted, are not checked)
 def checkL_tm  (i:str, s:tuple) -> bool:
     return True
 
 # s: (value of the return variable, dict with all variables)
+# (inputs stopped by --maxSteps, --timeout or --cycleCheck are undecided and not
+# checked)
 def checkL_goto(i:str, s:tuple) -> bool:
     # checks if the goto programm correctly computes the amount of set bits
     return "{0:b}".format(int(i)).count('1') == s[0]
@@ -88,20 +94,26 @@ def cntRand(l:int) -> int:
 # only in effect, if no checks argument is given in the input yaml
 # genrates the words that are checked. This is provided, since sometimes the
 # default random generator isn't good enough and only wrong words are checked
-def genRandomWords(startLen:int, endLen:int, cntPerLength:Callable[[int,int],int], terminals:list[str]) -> Iterable[str]:
+# Returning Words (see ele.py) gives the progressbar the exact total, a plain
+# Iterable[str] works as well (the total is the sum of cntPerLength then)
+def genRandomWords(startLen:int, endLen:int, cntPerLength:Callable[[int,int],int], terminals:list[str]) -> Words:
     return genAll(startLen, endLen, terminals)
     # return genRand(startLen, endLen, cntPerLength, terminals)
 
-def genAll(startLen:int, endLen:int, terminals:list[str]) -> Iterable[str]:
-    for l in range(startLen,endLen):
-        rs = itertools.product(*tuple([terminals])*l)
-        for r in rs:
-            yield "".join(r)
-
-def genRand(startLen:int, endLen:int, cntPerLength:Callable[[int,int],int], terminals:list[str]) -> Iterable[str]:
-    for l in range(startLen, endLen):
-        for _ in range(cntPerLength(l, len(terminals))):
-            s = ""
-            for _ in range(l):
-                s += random.choice(terminals)
-            yield s
+def genAll(startLen:int, endLen:int, terminals:list[str]) -> Words:
+    def gen():
+        for l in range(startLen,endLen):
+            rs = itertools.product(*tuple([terminals])*l)
+            for r in rs:
+                yield "".join(r)
+    return Words(gen(), sum(len(terminals)**l for l in range(startLen, endLen)), distinct=uniqueConcat(terminals))
+
+def genRand(startLen:int, endLen:int, cntPerLength:Callable[[int,int],int], terminals:list[str]) -> Words:
+    def gen():
+        for l in range(startLen, endLen):
+            for _ in range(cntPerLength(l, len(terminals))):
+                s = ""
+                for _ in range(l):
+                    s += random.choice(terminals)
+                yield s
+    return Words(gen(), sum(cntPerLength(l, len(terminals)) for l in range(startLen, endLen)))
@@ -0,0 +1,132 @@
+# Copyright (c) 2024 Lukas Heindl
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+from typing import Callable
+from pyformlang.cfg import CFG, Terminal
+from pyformlang.cfg.parse_tree import ParseTree
+
+# CYK on a grammar in CNF where each cell of the table is a bitmask over the
+# variables (bit i <-> variables[i])
+class CYK:
+    def __init__(self, cnf:CFG):
+        self.variables = sorted(cnf.variables, key=lambda x: str(x.value))
+        self.varIdx    = {v:i for i,v in enumerate(self.variables)}
+        self.start     = self.varIdx.get(cnf.start_symbol, -1)
+        self.termHeads = {} # terminal -> mask of A with A -> terminal
+        self.pairHeads = {} # (B,C) -> mask of A with A -> B C
+        for p in cnf.productions:
+            h = 1 << self.varIdx[p.head]
+            if len(p.body) == 1:
+                self.termHeads[p.body[0].value] = self.termHeads.get(p.body[0].value, 0) | h
+            elif len(p.body) == 2:
+                bc = (self.varIdx[p.body[0]], self.varIdx[p.body[1]])
+                self.pairHeads[bc] = self.pairHeads.get(bc, 0) | h
+        self.lastWord = "" # word of lastTab (see prefixTable)
+        self.lastTab  = []
+        self.byLeft = [[] for _ in self.variables] # B -> [(mask of C, heads)]
+        self.byHead = [[] for _ in self.variables] # A -> [(B,C)]
+        for (b,c),h in self.pairHeads.items():
+            self.byLeft[b].append((1 << c, h))
+            for a in self._bits(h):
+                self.byHead[a].append((b,c))
+
+    @staticmethod
+    def _bits(m:int):
+        while m:
+            low = m & -m
+            yield low.bit_length()-1
+            m ^= low
+
+    def sets(self, m:int) -> set:
+        return {self.variables[i] for i in self._bits(m)}
+
+    # mask of all A with A -> B C, B in x and C in y
+    def combine(self, x:int, y:int) -> int:
+        ret = 0
+        while x:
+            low = x & -x
+            for c,h in self.byLeft[low.bit_length()-1]:
+                if y & c:
+                    ret |= h
+            x ^= low
+        return ret
+
+    # tab[l][i] is the mask of the variables deriving word[i:i+l+1]
+    def table(self, word:str) -> list[list[int]]:
+        return self.extend(word, [], 0)
+
+    # extends tab of word[:p] in place to the table of word, appending a symbol
+    # only adds the diagonal of the cells ending with it (every row gets one
+    # more cell). onCell(l,i,left,right,m) is called for every combination of
+    # a new cell and onSymbol(j) after the diagonal of word[j] is complete
+    def extend(self, word:str, tab:list[list[int]], p:int, onCell:Callable=None, onSymbol:Callable=None) -> list[list[int]]:
+        for j in range(p, len(word)):
+            tab.append([])
+            tab[0].append(self.termHeads.get(word[j], 0))
+            for l in range(1, j+1):
+                i = j-l
+                m = 0
+                for k in range(l):
+                    left, right = tab[k][i], tab[l-k-1][i+k+1]
+                    m |= self.combine(left, right)
+                    if onCell is not None:
+                        onCell(l, i, left, right, m)
+                tab[l].append(m)
+            if onSymbol is not None:
+                onSymbol(j)
+        return tab
+
+    # cuts tab (in place) down to the table of the first p symbols
+    @staticmethod
+    def truncate(tab:list[list[int]], p:int):
+        del tab[p:]
+        for l,row in enumerate(tab):
+            del row[p-l:]
+
+    # returns the table of word, reusing the one of the previous word for
+    # their common prefix (consecutive words of genAll share long prefixes)
+    def prefixTable(self, word:str, onCell:Callable=None, onSymbol:Callable=None) -> list[list[int]]:
+        p = len(os.path.commonprefix([self.lastWord, word]))
+        self.truncate(self.lastTab, p)
+        self.extend(word, self.lastTab, p, onCell, onSymbol)
+        self.lastWord = word
+        return self.lastTab
+
+    def accepts(self, tab:list[list[int]]) -> bool:
+        return self.start >= 0 and len(tab) > 0 and (tab[-1][0] >> self.start) & 1 == 1
+
+    # builds a (CNF) parse tree for word[i:i+l+1] derived from variable v
+    def parseTree(self, word:str, tab:list[list[int]], v:int=None, i:int=0, l:int=None) -> ParseTree:
+        if v is None:
+            v, l = self.start, len(word)-1
+        node = ParseTree(self.variables[v])
+        if l == 0:
+            node.sons.append(ParseTree(Terminal(word[i])))
+            return node
+        for k in range(l):
+            left, right = tab[k][i], tab[l-k-1][i+k+1]
+            for b,c in self.byHead[v]:
+                if (left >> b) & 1 and (right >> c) & 1:
+                    node.sons.append(self.parseTree(word, tab, b, i, k))
+                    node.sons.append(self.parseTree(word, tab, c, i+k+1, l-k-1))
+                    return node
+        raise ValueError("%s does not derive %s" % (self.variables[v], word[i:i+l+1]))
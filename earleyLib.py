@@ -0,0 +1,116 @@
+# Copyright (c) 2024 Lukas Heindl
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pyformlang.cfg import CFG, Variable, Epsilon
+from pyformlang.cfg.parse_tree import ParseTree
+
+# Earley recognizer working directly on the productions of a grammar (no
+# normal form needed). Nullable variables are handled as proposed by Aycock
+# and Horspool (predicting a nullable variable also moves the dot over it).
+# An item is (production index, dot, origin).
+class Earley:
+    def __init__(self, cfg:CFG):
+        self.start = cfg.start_symbol
+        self.prods = [(p.head, tuple(x for x in p.body if not isinstance(x, Epsilon))) for p in cfg.productions]
+        self.prods.sort(key=lambda p: (str(p[0].value), len(p[1]), str(p[1])))
+        self.byHead = {}
+        for i,(h,_) in enumerate(self.prods):
+            self.byHead.setdefault(h, []).append(i)
+
+        self.nullable = set()
+        changed = True
+        while changed:
+            changed = False
+            for h,body in self.prods:
+                if h not in self.nullable and all(x in self.nullable for x in body):
+                    self.nullable.add(h)
+                    changed = True
+
+    def chart(self, word:str) -> list[set]:
+        n = len(word)
+        sets    = [set() for _ in range(n+1)]
+        waiting = [{} for _ in range(n+1)] # k -> variable -> items with the dot in front of it
+        sets[0].update((p,0,0) for p in self.byHead.get(self.start, []))
+        for k in range(n+1):
+            todo = list(sets[k])
+            def add(item):
+                if item not in sets[k]:
+                    sets[k].add(item)
+                    todo.append(item)
+            while todo:
+                item = todo.pop()
+                p,d,o = item
+                head,body = self.prods[p]
+                if d < len(body):
+                    x = body[d]
+                    if isinstance(x, Variable):
+                        waiting[k].setdefault(x, []).append(item)
+                        for q in self.byHead.get(x, []):
+                            add((q,0,k))
+                        if x in self.nullable:
+                            add((p,d+1,o))
+                    elif k < n and x.value == word[k]:
+                        sets[k+1].add((p,d+1,o))
+                else:
+                    for p2,d2,o2 in waiting[o].get(head, []):
+                        add((p2,d2+1,o2))
+        return sets
+
+    def accepts(self, chart:list[set]) -> bool:
+        return any((p,len(self.prods[p][1]),0) in chart[-1] for p in self.byHead.get(self.start, []))
+
+    # builds a parse tree over the original productions from the chart
+    def parseTree(self, word:str, chart:list[set]) -> ParseTree:
+        return self._tree(word, chart, self.start, 0, len(word), set())
+
+    def _tree(self, word, chart, var, i, j, active):
+        active = active | {(var,i,j)} # guards against unit/epsilon cycles
+        for p in self.byHead.get(var, []):
+            if (p,len(self.prods[p][1]),i) in chart[j]:
+                sons = self._sons(word, chart, p, len(self.prods[p][1]), i, j, active)
+                if sons is not None:
+                    node = ParseTree(var)
+                    # epsilon productions get an explicit epsilon leaf
+                    node.sons = sons if sons else [ParseTree(Epsilon())]
+                    return node
+        return None
+
+    # parse trees for body[:m] of production p deriving word[i:j]
+    def _sons(self, word, chart, p, m, i, j, active):
+        if m == 0:
+            return [] if i == j else None
+        x = self.prods[p][1][m-1]
+        if not isinstance(x, Variable):
+            if j > i and word[j-1] == x.value and (p,m-1,i) in chart[j-1]:
+                rest = self._sons(word, chart, p, m-1, i, j-1, active)
+                if rest is not None:
+                    return rest + [ParseTree(x)]
+            return None
+        for k in range(j, i-1, -1):
+            if (p,m-1,i) not in chart[k] or (x,k,j) in active:
+                continue
+            sub = self._tree(word, chart, x, k, j, active)
+            if sub is None:
+                continue
+            rest = self._sons(word, chart, p, m-1, i, k, active)
+            if rest is not None:
+                return rest + [sub]
+        return None
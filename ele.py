@@ -19,7 +19,14 @@
 # SOFTWARE.
 
 import random
+import itertools
+import io
+import contextlib
+import multiprocessing
+import sqlite3
+from collections import deque
 from typing import Callable, Iterable
+from sweep import genShard
 
 # Print iterations progress from https://stackoverflow.com/a/34325723
 def printProgressBar (iteration, total, prefix = '', suffix = '', decimals = 1, length = 100, fill = '█', printEnd = "\r"):
@@ -43,38 +50,263 @@ def printProgressBar (iteration, total, prefix = '', suffix = '', decimals = 1,
     if iteration == total: 
         print()
 
-def genRandomWords(startLen:int, endLen:int, cntPerLength:Callable[[int,int],int], terminals:list[str]) -> Iterable[str]:
-    for l in range(startLen, endLen):
-        for _ in range(cntPerLength(l, len(terminals))):
-            string = ""
-            for _ in range(l):
-                string += random.choice(terminals)
-            yield string
+# generated words together with their amount (len -> total of the
+# progressbar) and if they are known to be distinct (-> nothing to filter for
+# --unique)
+class Words:
+    def __init__(self, words:Iterable[str], count:int, distinct:bool=False):
+        self.words    = words
+        self.count    = count
+        self.distinct = distinct
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self) -> int:
+        return self.count
+
+# if concatenating the terminals can't give the same word twice
+def uniqueConcat(terminals:list[str]) -> bool:
+    return len(set(terminals)) == len(terminals) and all(len(t) == 1 for t in terminals)
+
+def genRandomWords(startLen:int, endLen:int, cntPerLength:Callable[[int,int],int], terminals:list[str]) -> Words:
+    def gen():
+        for l in range(startLen, endLen):
+            for _ in range(cntPerLength(l, len(terminals))):
+                string = ""
+                for _ in range(l):
+                    string += random.choice(terminals)
+                yield string
+    return Words(gen(), sum(cntPerLength(l, len(terminals)) for l in range(startLen, endLen)))
+
+# Exact set of the words seen so far with bounded memory: up to limit words
+# are kept in a set, then they are moved to a temporary on-disk sqlite
+# database
+class UniqueFilter:
+    def __init__(self, limit:int=1_000_000):
+        self.limit = limit
+        self.mem   = set()
+        self.db    = None
+
+    # returns whether word was seen before and remembers it
+    def seen(self, word:str) -> bool:
+        if word in self.mem:
+            return True
+        if self.db is not None and self.db.execute("SELECT 1 FROM words WHERE w = ?", (word,)).fetchone():
+            return True
+        self.mem.add(word)
+        if len(self.mem) >= self.limit:
+            self.spill()
+        return False
+
+    def spill(self):
+        if self.db is None:
+            self.db = sqlite3.connect("") # private temporary database on disk
+            self.db.execute("CREATE TABLE words (w TEXT PRIMARY KEY)")
+        self.db.executemany("INSERT OR IGNORE INTO words VALUES (?)", ((w,) for w in self.mem))
+        self.db.commit()
+        self.mem.clear()
+
+# element of a worker process of checkAny (see jobs)
+_worker = None
+
+def _initWorker(loader:Callable[[],"Ele"]):
+    global _worker
+    with contextlib.redirect_stdout(io.StringIO()): # the main process already printed this
+        _worker = loader()
+
+# returns the results of the chunk together with everything that was printed
+# while simulating each word (so the parent can replay it in order) and the
+# state the element collected (e.g. the syntax trees of a Cfg)
+def _simulateWorker(words:list[str]) -> tuple[list,list[str],list]:
+    if _worker.batchSize > 1:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            rs = _worker.simulateChunk(words)
+        outs = [out.getvalue()] + [""] * (len(words)-1)
+    else:
+        rs, outs = [], []
+        for w in words:
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                rs.append(_worker.simulate(w))
+            outs.append(out.getvalue())
+    return rs, outs, _worker.takeState()
 
 class Ele:
+    # amount of words handed to simulateChunk at once (elements which are
+    # able to simulate many words at once raise this)
+    batchSize = 1
+    # whether the compiled artifacts are worth to be cached on disk
+    cacheable = False
+
     def __init__(self, terminals:list[str], checks:list[str]):
         self.terminals = terminals
         self.checks    = checks
+        # --profile counts of all simulations so far (see profileCounts)
+        self.profiled  = {}
     
     def simulate(self, i:str) -> tuple[bool,list,list]:
         raise Exception("super 'simulate' shouldn't be called")
+    def simulateChunk(self, words:list[str]) -> list[tuple]:
+        return [self.simulate(w) for w in words]
+    # derived artifacts (conversions, normal forms, ...) are built by compile.
+    # dumpCompiled exports them as plain (msgpack compatible) data which
+    # loadCompiled imports again, so the conversion can be skipped
+    def compile(self):
+        pass
+    def dumpCompiled(self) -> dict:
+        return {}
+    def loadCompiled(self, d:dict):
+        pass
+    # state collected while simulating (e.g. syntax trees) which has to be
+    # passed from the workers of checkAny back to the main process, by default
+    # the profile counts
+    def takeState(self) -> list:
+        counts = self.takeProfile()
+        return [] if counts is None else [counts]
+    def mergeState(self, state:list):
+        for counts in state:
+            for k,cnt in counts.items():
+                self.profiled[k] = self.profiled.get(k, 0) + cnt
+    # counts of the simulator since the last call keyed like the output of
+    # --profile, None if the element isn't profiled
+    def takeProfile(self) -> dict[str,int]:
+        return None
+    def profileCounts(self) -> dict[str,int]:
+        self.mergeState(self.takeState())
+        return self.profiled
+    # the language as langLib object (count/enumerate/sample words of a
+    # length), None if the element can't provide it
+    def language(self):
+        return None
+    # prefix sharing simulation (see trieResults): trieRoot returns the
+    # configuration before reading a word of length l (None if the element
+    # doesn't support it), trieStep the one after reading c, trieDead if no word
+    # with the prefix read so far is accepted and trieResult the result of the
+    # simulation of the word read so far
+    def trieRoot(self, l:int):
+        return None
+    def trieStep(self, node, c:str):
+        raise Exception("super 'trieStep' shouldn't be called")
+    def trieDead(self, node) -> bool:
+        return False
+    def trieResult(self, node) -> tuple:
+        raise Exception("super 'trieResult' shouldn't be called")
     def toTikz(self, f) -> bool:
         raise Exception("super 'toTikz' shouldn't be called")
     def toDot(self, fi:str) -> bool:
         raise Exception("super 'toDot' shouldn't be called")
 
-    def checkAny(self, words:Iterable[str], checkL:Callable[[str,tuple],bool], check:bool, l:int, progress:bool, unique:bool):
-        bs = []
-        last = True
-        uniqueWords = set()
-        for j,word in enumerate(words):
-            if unique:
-                if word in uniqueWords:
+    # yields (index in words,word,result of the simulation)
+    # with jobs > 1 the chunks are simulated by a pool of processes, each one
+    # holding its own element created by loader
+    def results(self, words:Iterable[str], unique:bool, jobs:int=1, loader:Callable[[],"Ele"]=None) -> Iterable[tuple[int,str,tuple]]:
+        uniqueWords = UniqueFilter()
+        def filtered():
+            for j,word in enumerate(words):
+                if unique and uniqueWords.seen(word):
                     continue
-                uniqueWords.add(word)
-            s = self.simulate(word)
-            bs.append(s[0])
-            if check:
+                yield j,word
+        it = filtered()
+        if jobs <= 1:
+            while True:
+                chunk = list(itertools.islice(it, self.batchSize))
+                if not chunk:
+                    break
+                for (j,word),s in zip(chunk, self.simulateChunk([w for _,w in chunk])):
+                    yield j,word,s
+            return
+
+        size = max(self.batchSize, 64)
+        with multiprocessing.Pool(jobs, initializer=_initWorker, initargs=(loader,)) as pool:
+            pending = deque()
+            while True:
+                # keep a bounded amount of chunks in flight, words might be an
+                # endless generator
+                while len(pending) < 4*jobs:
+                    chunk = list(itertools.islice(it, size))
+                    if not chunk:
+                        break
+                    pending.append((chunk, pool.apply_async(_simulateWorker, ([w for _,w in chunk],))))
+                if not pending:
+                    break
+                chunk, res = pending.popleft()
+                rs, outs, state = res.get()
+                self.mergeState(state)
+                for (j,word),s,out in zip(chunk, rs, outs):
+                    print(out, end="")
+                    yield j,word,s
+
+    # yields (index,word,result) like results for the words of length l with
+    # the indices [lo,hi) in the order of itertools.product(terminals) (indices
+    # start with j). The trie of the words is traversed depth first, so every
+    # prefix is simulated only once, below dead prefixes nothing is simulated
+    def trieResults(self, l:int, lo:int, hi:int, terminals:list[str], j:int=0) -> Iterable[tuple[int,str,tuple]]:
+        if lo >= hi:
+            return
+        k = len(terminals)
+        sizes = [k**(l-d) for d in range(l+1)] # words below a node of depth d
+        todo = [(self.trieRoot(l), "", 0, 0)] # node, prefix, depth, index of the first word below
+        while todo:
+            node, word, d, base = todo.pop()
+            if d == l:
+                yield j, word, self.trieResult(node)
+                j += 1
+            elif self.trieDead(node):
+                for suffix in genShard(l-d, max(lo, base)-base, min(hi, base+sizes[d])-base, terminals):
+                    yield j, word+suffix, self.trieResult(node)
+                    j += 1
+            else:
+                for a in range(k-1, -1, -1):
+                    b = base + a*sizes[d+1]
+                    if b < hi and b + sizes[d+1] > lo:
+                        todo.append((self.trieStep(node, terminals[a]), word+terminals[a], d+1, b))
+
+    # trieResults for all words of the lengths [startLen,endLen)
+    def trieSweep(self, startLen:int, endLen:int, terminals:list[str]) -> Iterable[tuple[int,str,tuple]]:
+        j = 0
+        for l in range(startLen, endLen):
+            n = len(terminals)**l
+            yield from self.trieResults(l, 0, n, terminals, j)
+            j += n
+
+    # with writer (see output.ResultWriter) the results are written there
+    # instead of printed. Returns the counters (True, False, undecided), stats
+    # controls if they are printed. results: already simulated words (see
+    # trieResults) which are used instead of simulating words
+    def checkAny(self, words:Iterable[str], checkL:Callable[[str,tuple],bool], check:bool, l:int, progress:bool, unique:bool, jobs:int=1, loader:Callable[[],"Ele"]=None, writer=None, stats:bool=True, results:Iterable[tuple[int,str,tuple]]=None) -> tuple[int,int,int]:
+        # running counters of the results (True, False, undecided)
+        cntTrue, cntFalse, cntUndecided = 0, 0, 0
+        last = True
+        # position in the generated words (the progressbar refers to it, with
+        # unique skipped duplicates are counted as well)
+        pos = 0
+        counting = results is None
+        if counting:
+            def counted():
+                nonlocal pos
+                for w in words:
+                    pos += 1
+                    yield w
+            results = self.results(counted(), unique, jobs, loader)
+        for j,word,s in results:
+            if s[0] is None:
+                cntUndecided += 1
+            elif s[0] == True:
+                cntTrue += 1
+            elif s[0] == False:
+                cntFalse += 1
+            if writer is not None:
+                writer.write(word, s, checkL(word,s) if check and s[0] is not None else None)
+            elif s[0] is None:
+                # undecided (e.g. a budget was exhausted) -> nothing to check
+                if progress:
+                    print(("" if last else "\n") + "%-135s" % " ".join(map(lambda x:str(x),("Undecided:", word, *s))), end="")
+                    last = False
+                else:
+                    print("%s" % " ".join(map(lambda x:str(x),("Undecided:", word, *s))))
+            elif check:
                 c = checkL(word,s)
                 if not c:
                     if progress:
@@ -88,13 +320,22 @@ class Ele:
                     last = False
                 else:
                     print("%s" % " ".join(map(lambda x:str(x),(word, *s))))
+            if not counting:
+                pos = j+1
             if progress and j % 10 == 0:
-                printProgressBar(j+1,l, suffix="Refers to #checked words")
+                printProgressBar(j+1,l, suffix="Refers to #generated words")
                 last = True
 
         if progress:
-            print("")
+            if l > 0:
+                printProgressBar(pos, l, suffix="Refers to #generated words")
+            if pos != l or l == 0:
+                print("")
 
-        print("\nStats (eval of automata):")
-        print("True", len(list(filter(lambda x: x==True, bs))))
-        print("False", len(list(filter(lambda x: x==False, bs))))
+        if stats:
+            print("\nStats (eval of automata):")
+            print("True", cntTrue)
+            print("False", cntFalse)
+            if cntUndecided > 0:
+                print("Undecided", cntUndecided)
+        return cntTrue, cntFalse, cntUndecided
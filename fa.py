@@ -19,7 +19,9 @@
 # SOFTWARE.
 
 import yaml
+import numpy as np
 from ele import Ele
+from langLib import DfaLanguage
 from pyformlang.finite_automaton import EpsilonNFA, State, Symbol, Epsilon
 from terminaltables import SingleTable
 import copy
@@ -30,10 +32,137 @@ def make_tuple(i:str):
     return t[0:3]
 
 class AutomataRegul(Ele):
+    batchSize = 4096
+    # NFAs whose DFA has more states are simulated word by word (the subset
+    # construction may blow up exponentially)
+    batchStates = 1 << 12
+
     def __init__(self, checks:list[str], aut:EpsilonNFA):
         super().__init__(terminals=list(map(lambda x: x.value, aut.symbols)), checks=checks)
         self.enfa   = aut
         self.states = aut.states
+        self._dfa   = None
+        self._dfaOver = None
+        self._live  = None
+        self.compile()
+
+    # lowers the automaton to integer indices so that simulate does not have
+    # to compute epsilon closures and hash pyformlang objects on every step
+    # DFA: table[state][symbol] -> state (-1 if undefined)
+    # NFA: ntable[symbol][state] -> bitset of the epsilon closed successors
+    def compile(self):
+        states = sorted(self.enfa.states, key=lambda x: str(x.value))
+        self.stateIdx = {s:i for i,s in enumerate(states)}
+        self.symIdx   = {c:i for i,c in enumerate(self.terminals)}
+        self.deterministic = self.enfa.is_deterministic()
+
+        if self.deterministic:
+            self.table = [[-1 for _ in self.terminals] for _ in states]
+            for s in states:
+                for c,a in self.symIdx.items():
+                    dst = self.enfa._get_next_states_iterable([s], c)
+                    if len(dst) == 1:
+                        self.table[self.stateIdx[s]][a] = self.stateIdx[dst.pop()]
+            self.accept = [self.enfa.is_final_state(s) for s in states]
+            starts = list(self.enfa.start_states)
+            self.start = self.stateIdx[starts[0]] if len(starts) == 1 else -1
+        else:
+            closure = [self._toMask(self.enfa.eclose(s)) for s in states]
+            self.ntable = [[0 for _ in states] for _ in self.terminals]
+            for s in states:
+                for c,a in self.symIdx.items():
+                    m = 0
+                    for dst in self.enfa._get_next_states_iterable([s], c):
+                        m |= closure[self.stateIdx[dst]]
+                    self.ntable[a][self.stateIdx[s]] = m
+            self.startMask = self._toMask(self.enfa.eclose_iterable(self.enfa.start_states))
+            self.finalMask = self._toMask(self.enfa.final_states)
+
+    # returns (table,accept,start) of a complete DFA as numpy arrays. The last
+    # row is a sink state and the last column catches symbols which are not
+    # part of the alphabet. NFAs are determinized via subset construction on
+    # the compiled bitsets, None if the DFA would have more than limit states.
+    def dfa(self, limit:int=None) -> tuple[np.ndarray,np.ndarray,int]:
+        if self._dfa is not None:
+            return self._dfa
+        if limit is not None and self._dfaOver is not None and limit <= self._dfaOver:
+            return None
+        k = len(self.terminals)
+        if self.deterministic:
+            n = len(self.table)
+            rows = [[n if d < 0 else d for d in r] + [n] for r in self.table]
+            accept = self.accept + [False]
+            start = n if self.start < 0 else self.start
+        else:
+            subsets = {self.startMask: 0}
+            todo = [self.startMask]
+            rows = []
+            while todo:
+                if limit is not None and len(subsets) > limit:
+                    self._dfaOver = limit
+                    return None
+                cur = todo.pop(0)
+                row = []
+                for a in range(k):
+                    nxt = 0
+                    m = cur
+                    while m:
+                        low = m & -m
+                        nxt |= self.ntable[a][low.bit_length()-1]
+                        m ^= low
+                    if nxt not in subsets:
+                        subsets[nxt] = len(subsets)
+                        todo.append(nxt)
+                    row.append(subsets[nxt])
+                rows.append(row)
+            n = len(rows)
+            rows = [r + [n] for r in rows]
+            accept = [m & self.finalMask != 0 for m in subsets] + [False]
+            start = 0
+        rows.append([n] * (k+1))
+        self._dfa = (np.array(rows, dtype=np.intp), np.array(accept, dtype=bool), start)
+        return self._dfa
+
+    # the words are counted/sampled on the complete DFA (see dfa)
+    def language(self) -> DfaLanguage:
+        table, accept, start = self.dfa()
+        return DfaLanguage(table, accept, start, self.terminals)
+
+    # returns a boolean array with the acceptance of each word
+    # words of equal length are stepped through the DFA table at once
+    def simulateBatch(self, words:list[str]) -> np.ndarray:
+        table, accept, start = self.dfa()
+        k = len(self.terminals)
+        single = {c:a for c,a in self.symIdx.items() if len(c) == 1}
+        maxCp = max(map(ord, single), default=0)
+        lut = np.full(maxCp+1, k, dtype=np.uint8 if k < 255 else np.uint16)
+        for c,a in single.items():
+            lut[ord(c)] = a
+
+        ret = np.zeros(len(words), dtype=bool)
+        byLen = {}
+        for j,w in enumerate(words):
+            byLen.setdefault(len(w), []).append(j)
+        for n,idx in byLen.items():
+            st = np.full(len(idx), start, dtype=np.intp)
+            if n > 0:
+                cps = np.frombuffer("".join(words[j] for j in idx).encode("utf-32-le"), dtype=np.uint32).reshape(len(idx), n)
+                codes = np.where(cps <= maxCp, lut[np.minimum(cps, maxCp)], k)
+                for c in range(n):
+                    st = table[st, codes[:,c]]
+            ret[idx] = accept[st]
+        return ret
+
+    def simulateChunk(self, words:list[str]) -> list[tuple]:
+        if self.dfa(self.batchStates) is None:
+            return [self.simulate(w) for w in words]
+        return [(bool(a),[],[]) for a in self.simulateBatch(words)]
+
+    def _toMask(self, states) -> int:
+        m = 0
+        for s in states:
+            m |= 1 << self.stateIdx[s]
+        return m
 
     def toTikz(self,f) -> bool:
         # preamble
@@ -71,10 +200,90 @@ class AutomataRegul(Ele):
     def toRegex(self):
         return self.enfa.to_regex()
 
+    # bitset of the states from which an accepting state is reachable
+    def liveMask(self) -> int:
+        if self._live is not None:
+            return self._live
+        if self.deterministic:
+            n = len(self.table)
+            live = sum(1 << s for s in range(n) if self.accept[s])
+            succ = [sum(1 << d for d in set(r) if d >= 0) for r in self.table]
+        else:
+            n = len(self.stateIdx)
+            live = self.finalMask
+            succ = [0] * n
+            for row in self.ntable:
+                for s,m in enumerate(row):
+                    succ[s] |= m
+        changed = True
+        while changed:
+            changed = False
+            for s in range(n):
+                if not live >> s & 1 and succ[s] & live:
+                    live |= 1 << s
+                    changed = True
+        self._live = live
+        return live
+
+    # prefix sharing simulation (see Ele.trieResults), nodes are the state
+    # (DFA, -1 -> none) or the bitset of states (NFA, only live ones)
+    def trieRoot(self, l:int):
+        if self.deterministic:
+            return self.start
+        return self.startMask & self.liveMask()
+
+    def trieStep(self, node, c:str):
+        a = self.symIdx.get(c)
+        if self.deterministic:
+            return -1 if a is None or node < 0 else self.table[node][a]
+        if a is None:
+            return 0
+        row = self.ntable[a]
+        nxt = 0
+        while node:
+            low = node & -node
+            nxt |= row[low.bit_length()-1]
+            node ^= low
+        return nxt & self.liveMask()
+
+    def trieDead(self, node) -> bool:
+        if self.deterministic:
+            return node < 0 or not self.liveMask() >> node & 1
+        return node == 0
+
+    def trieResult(self, node) -> tuple:
+        if self.deterministic:
+            return (node >= 0 and self.accept[node],[],[])
+        return (node & self.finalMask != 0,[],[])
+
     # returns (accepted,[],[])
     def simulate(self, i:str):
-        l = [c for c in i]
-        return(self.enfa.accepts(l),[],[])
+        symIdx = self.symIdx
+        if self.deterministic:
+            table = self.table
+            st = self.start
+            for c in i:
+                a = symIdx.get(c)
+                if a is None or st < 0:
+                    return (False,[],[])
+                st = table[st][a]
+            return (st >= 0 and self.accept[st],[],[])
+
+        cur = self.startMask
+        for c in i:
+            a = symIdx.get(c)
+            if a is None:
+                return (False,[],[])
+            row = self.ntable[a]
+            nxt = 0
+            while cur:
+                low = cur & -cur
+                nxt |= row[low.bit_length()-1]
+                cur ^= low
+            cur = nxt
+            if not cur:
+                break
+        return (cur & self.finalMask != 0,[],[])
 
     @classmethod
     def loadJflap(cls, path:str):
@@ -182,6 +391,86 @@ class AutomataRegul(Ele):
 
         self.mini_tabToString(tab[:], states, True, "Final")
     
+    # Hopcroft partition refinement on the compiled table, O(n*k*log n)
+    # returns the minimized automaton (unreachable states are dropped)
+    def minimizeHopcroft(self) -> "AutomataRegul":
+        if not self.deterministic:
+            raise Exception("FA is not DFA -> no minimization")
+        states = sorted(self.stateIdx, key=lambda x: self.stateIdx[x])
+        k = len(self.terminals)
+        n = len(states)
+        sink = n # only used if the table is partial
+
+        reachable = []
+        seen = set()
+        todo = [] if self.start < 0 else [self.start]
+        seen.update(todo)
+        while todo:
+            q = todo.pop()
+            reachable.append(q)
+            for d in (self.table[q] if q != sink else [sink]*k):
+                d = sink if d < 0 else d
+                if d not in seen:
+                    seen.add(d)
+                    todo.append(d)
+        delta = lambda q,a: sink if q == sink or self.table[q][a] < 0 else self.table[q][a]
+
+        inv = [{} for _ in range(k)]
+        for q in reachable:
+            for a in range(k):
+                inv[a].setdefault(delta(q,a), []).append(q)
+
+        final    = {q for q in reachable if q != sink and self.accept[q]}
+        nonFinal = set(reachable) - final
+        blocks = [b for b in (final, nonFinal) if b]
+        blockOf = {q:i for i,b in enumerate(blocks) for q in b}
+        work = set(range(len(blocks)))
+        while work:
+            splitter = set(blocks[work.pop()])
+            for a in range(k):
+                touched = {}
+                for q in splitter:
+                    for p in inv[a].get(q, []):
+                        touched.setdefault(blockOf[p], set()).add(p)
+                for b,inter in touched.items():
+                    if len(inter) == len(blocks[b]):
+                        continue
+                    blocks[b] -= inter
+                    blocks.append(inter)
+                    for p in inter:
+                        blockOf[p] = len(blocks)-1
+                    if b in work or len(inter) <= len(blocks[b]):
+                        work.add(len(blocks)-1)
+                    else:
+                        work.add(b)
+
+        name = lambda q: "sink" if q == sink else str(states[q].value)
+        classes = sorted((sorted(b, key=lambda q: (q == sink, name(q))) for b in blocks), key=lambda b: name(b[0]))
+        print("Equivalence classes (Hopcroft):")
+        for b in classes:
+            print("  %s = {%s}" % (name(b[0]), ", ".join(map(name, b))))
+        unreachable = [name(q) for q in range(n) if q not in seen]
+        if unreachable:
+            print("  unreachable (dropped):", ", ".join(unreachable))
+
+        rep = {}
+        for b in classes:
+            if b != [sink]:
+                for q in b:
+                    rep[q] = State(name(b[0]))
+        enfa = EpsilonNFA()
+        for q,st in rep.items():
+            if q != sink and rep[q].value == name(q):
+                for a,c in enumerate(self.terminals):
+                    d = delta(q,a)
+                    if d in rep:
+                        enfa.add_transition(st, Symbol(c), rep[d])
+                if self.accept[q]:
+                    enfa.add_final_state(st)
+        if self.start in rep:
+            enfa.add_start_state(rep[self.start])
+        return AutomataRegul(checks=self.checks, aut=enfa)
+
     def mini_tabToString(self, tab, states, final, title):
         tab = copy.deepcopy(tab)
         for l,_ in enumerate(tab):
@@ -21,11 +21,12 @@
 from gotoLib import GOTO
 from ele import Ele
 import yaml
-from functools import partial
 import re
 
 class Goto(Ele):
-    
+    # inputs are run by GOTO.runBatch in chunks of this size
+    batchSize = 4096
+
     def __init__(self, aut:GOTO, ins:list[str], checks:list[str], cmdS:list, labels:list):
         super().__init__(terminals=ins, checks=checks)
         self.goto = aut
@@ -44,8 +45,25 @@ class Goto(Ele):
                 continue
             cmdS[ind] += (labels[ind],)
 
+    # returns (value of the return variable, variables) or
+    # (None, reason, variables) if the run was stopped by a budget
     def simulate(self, i:str):
-        return self.goto.run(i)
+        ret = self.goto.run(i)
+        if self.goto.undecided is not None:
+            return (None, self.goto.undecided, ret[1])
+        return ret
+
+    def simulateChunk(self, words:list[str]) -> list[tuple]:
+        if not self.goto.batchable():
+            return [self.simulate(w) for w in words]
+        rs = self.goto.runBatch([int(w) for w in words])
+        # run only returns None as result if the step budget is exhausted
+        return [self.simulate(w) if r is None else (None, 'maxSteps', r[1]) if r[0] is None else r
+                for w,r in zip(words, rs)]
+
+    # executions per label
+    def takeProfile(self) -> dict[str,int]:
+        return self.goto.takeProfile() if self.goto.profile else None
 
     def toDot(self, f):
         print("goto does no toDot()")
@@ -63,8 +81,10 @@ class Goto(Ele):
             r"morestring = [b]", r"}"]), file=f)
 
         print(r"\begin{document}" + "\n" + r"\begin{lstlisting}[language=goto,escapechar=|,mathescape=true,numbers=left]", file=f)
-        for c in self.cmdS:
-            print(c[0], (r"|\label{%s}|" % ",".join(list(map(str,c[1:]))) ) if len(c[1:]) > 0 else "", file=f)
+        counts = self.profileCounts() if self.goto.profile else {}
+        for lbl,c in zip(self.labels, self.cmdS):
+            heat = (" // %dx" % counts.get(str(lbl), 0)) if counts else ""
+            print(c[0], (r"|\label{%s}|" % ",".join(list(map(str,c[1:]))) ) if len(c[1:]) > 0 else "", heat, file=f)
         print(r"\end{lstlisting}" + "\n" + r"\end{document}", file=f)
         return True
 
@@ -97,60 +117,60 @@ class Goto(Ele):
         else:
             if verbose >= 1:
                 print("procedures")
-            order = {}
-            lastLbl = ""
             for l1,d1 in d['procedure'].items():
                 labels.append(l1)
                 cmdS.append((d1,))
-                order[lastLbl] = l1
-                lastLbl = l1
                 t = d1.split()
                 if len(t) == 5 and t[1] == '=':
                     if t[3] == '+':
                         if verbose >= 1:
                             print("parsed as ADD", t)
                         # x = y + 3
-                        goto.addFunction(lbl=l1, func=partial(goto.plus, t[0], t[2], t[4]))
+                        goto.addInstr(l1, 'plus', t[0], t[2], t[4])
                     elif t[3] == '-':
                         if verbose >= 1:
                             print("parsed as MINUS", t)
                         # x = y - 3
-                        goto.addFunction(lbl=l1, func=partial(goto.minus, t[0], t[2], t[4]))
+                        goto.addInstr(l1, 'minus', t[0], t[2], t[4])
                     elif t[3] == 'div':
                         if verbose >= 1:
                             print("parsed as DIV", t)
                         # x = y div 3
-                        goto.addFunction(lbl=l1, func=partial(goto.div, t[0], t[2], t[4]))
+                        goto.addInstr(l1, 'div', t[0], t[2], t[4])
                     elif t[3] == 'mod':
                         if verbose >= 1:
                             print("parsed as MOD", t)
                         # x = y mod 3
-                        goto.addFunction(lbl=l1, func=partial(goto.mod, t[0], t[2], t[4]))
+                        goto.addInstr(l1, 'mod', t[0], t[2], t[4])
                     elif t[3] == '*':
                         if verbose >= 1:
                             print("parsed as MUL", t)
                         # x = y * 3
-                        goto.addFunction(lbl=l1, func=partial(goto.mul, t[0], t[2], t[4]))
+                        goto.addInstr(l1, 'mul', t[0], t[2], t[4])
                     else:
                         raise ValueError("Procedure %s was not understood, 1" % str(t))
 
                 elif len(t) == 2 and t[0] == 'goto':
-                    goto.addFunction(lbl=l1, func=partial(goto.goto, t[1]))
+                    goto.addInstr(l1, 'goto', t[1])
 
                 elif len(t) == 6 and t[0] == 'if' and t[4] == 'goto':
-                    goto.addFunction(lbl=l1, func=partial(goto.ifGoto, lbl=t[5], pred=goto.pred(t[1:4])))
+                    goto.addInstr(l1, 'ifGoto', t[5], *t[1:4])
 
                 elif len(t) == 3 and t[1] == ':=':
                     if verbose >= 1:
                         print("parsed as ASSIGNMENT", t)
-                    goto.addFunction(lbl=l1, func=partial(goto.assign, t[0], t[2]))
+                    goto.addInstr(l1, 'assign', t[0], t[2])
                 elif len(t) == 1 and t[0] == 'halt':
-                    goto.addFunction(lbl=l1, func=partial(goto.halt))
+                    goto.addInstr(l1, 'halt')
                 else:
                     raise ValueError("Procedure %s was not understood, 1" % str(t))
-            goto.specifyOrder(order)
+            goto.compile()
             if verbose >= 1:
                 print()
+            if verbose >= 2:
+                print("compiled")
+                print(goto.source)
+                print()
 
         if 'insert' in d and isinstance(d['insert'], list):
             for c in d['insert']:
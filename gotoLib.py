@@ -18,113 +18,304 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from typing import Callable
+import math
+import time
+import operator
+import numpy as np
 
 
 class GOTO:
     
     def __init__(self, startLbl:str, inputVar:str, retVar:str):
         self.vars  = {}
-        self.funcs = {}
         self.startLbl = startLbl
         self.startVar = inputVar
         self.retVar = retVar
-        self.next = {}
+        # (label, op, operand tokens) in program order, see addInstr
+        self.instrs = []
+        self.labels = set()
+        self.blocks = None
+        # budgets of run (None -> unlimited), if one is exhausted the result
+        # is undecided. cycleCheck: every cycleCheck steps the state (block,
+        # variables) is remembered, reaching a remembered state again proves
+        # that the program does not halt.
+        self.maxSteps   = None
+        self.timeout    = None
+        self.cycleCheck = None
+        # stats of the last run: executed steps and why the run is undecided
+        # ('maxSteps', 'timeout', 'loop' or None)
+        self.steps     = 0
+        self.undecided = None
+        # whether the compiled blocks count their executions (see
+        # enableProfile), compiled without the counters otherwise
+        self.profile = False
 
-    def accessVar(self, var:str):
-        if str(var) not in self.vars:
-            self.vars[str(var)] = 0
+    # Compiles the program to one python function per basic block. Labels are
+    # resolved to block indices, variables to slots of a list (input
+    # variable first, then in program order) and constants are inlined.
+    # A block function executes its instructions and returns the index of the
+    # next block (-1 -> halt).
+    def compile(self):
+        binops = {'plus': '+', 'minus': '-', 'div': '//', 'mod': '%', 'mul': '*'}
+        cmps   = {'=': '==', '!=': '!=', '<=': '<=', '>=': '>=', '<': '<', '>': '>'}
+        idx = {lbl: i for i,(lbl,_,_) in enumerate(self.instrs)}
+        def target(lbl:str) -> int:
+            if str(lbl) not in idx:
+                raise KeyError("Label %s is not defined" % str(lbl))
+            return idx[str(lbl)]
 
-    def getVal(self, var:str):
-        if var.isdigit():
-            return int(var)
-        self.accessVar(var)
-        return self.vars[str(var)]
+        slots = {}
+        for v in [self.startVar] + [a for _,op,args in self.instrs for a in self.operands(op, args)] + [self.retVar]:
+            if not v.isdigit() and v not in slots:
+                slots[v] = len(slots)
+        def val(tok:str) -> str:
+            return str(int(tok)) if tok.isdigit() else "r[%d]" % slots[tok]
 
-    def run(self,i:int):
-        self.vars = {}
-        self.vars[str(self.startVar)] = int(i)
-        self.currLbl = self.startLbl
-        running = True
-
-        while running:
-            # print(self.currLbl, self.vars)
-            ex = self.currLbl # don't skip the first proc
-            if str(self.currLbl) not in self.next:
-                running = False
-            else:
-                self.currLbl = self.next[str(self.currLbl)]
-            if self.funcs[str(ex)]() == 1:
-                break;
-        return self.getVal(str(self.retVar)), self.vars
-
-    def specifyOrder(self, nxt:dict):
-        self.next = nxt
-
-    def assign(self, var:str, val:str):
-        self.accessVar(var)
-        self.vars[str(var)] = self.getVal(val)
-
-    # var1 = var2 - var3
-    def minus(self, var1:str, var2:str, var3:str):
-        self.vars[str(var1)] = self.getVal(var2) - self.getVal(var3)
-        return 0
+        # basic blocks start at the start label, at jump targets and after jumps
+        leaders = {target(self.startLbl)}
+        for i,(_,op,args) in enumerate(self.instrs):
+            if op in ['goto', 'ifGoto']:
+                leaders.add(target(args[0]))
+            if op in ['goto', 'ifGoto', 'halt']:
+                leaders.add(i+1)
+        leaders = sorted(l for l in leaders if l < len(self.instrs))
+        blockOf = {l: b for b,l in enumerate(leaders)}
+        def nextBlock(i:int) -> int:
+            return blockOf[i] if i < len(self.instrs) else -1
 
-    # var1 = var2 + var3
-    def plus(self, var1:str, var2:str, var3:str):
-        self.vars[str(var1)] = self.getVal(var2) + self.getVal(var3)
-        return 0
+        # operands for runBatch: (True, constant) or (False, slot)
+        def opnd(tok:str) -> tuple[bool,int]:
+            return (True, int(tok)) if tok.isdigit() else (False, slots[tok])
 
-    # var1 = var2 // var3
-    def div(self, var1:str, var2:str, var3:str):
-        self.vars[str(var1)] = self.getVal(var2) // self.getVal(var3)
-        return 0
+        src = []
+        # per block: list of (op, dst slot, operands) and how it ends, either
+        # ('goto', block) or ('if', comparison, operand, operand, block, block)
+        self.blockOps, self.blockEnds = [], []
+        for b,l in enumerate(leaders):
+            end = leaders[b+1] if b+1 < len(leaders) else len(self.instrs)
+            src.append("def b%d(r):" % b)
+            if self.profile:
+                src.append("    counts[%d] += 1" % b)
+            ret = "return %d" % nextBlock(end)
+            ops, ending = [], ('goto', nextBlock(end))
+            for i in range(l, end):
+                _,op,args = self.instrs[i]
+                if op in binops:
+                    src.append("    r[%d] = %s %s %s" % (slots[args[0]], val(args[1]), binops[op], val(args[2])))
+                    ops.append((op, slots[args[0]], opnd(args[1]), opnd(args[2])))
+                elif op == 'assign':
+                    src.append("    r[%d] = %s" % (slots[args[0]], val(args[1])))
+                    ops.append((op, slots[args[0]], opnd(args[1])))
+                elif op == 'goto':
+                    ret = "return %d" % blockOf[target(args[0])]
+                    ending = ('goto', blockOf[target(args[0])])
+                elif op == 'ifGoto':
+                    if args[2] not in cmps:
+                        raise ValueError("Predicate (%s) has to be of ['=', '!=', '<', '>', '<=', '>=']" % str(args[1:]))
+                    ret = "return %d if %s %s %s else %d" % (blockOf[target(args[0])], val(args[1]), cmps[args[2]], val(args[3]), nextBlock(i+1))
+                    ending = ('if', cmps[args[2]], opnd(args[1]), opnd(args[3]), blockOf[target(args[0])], nextBlock(i+1))
+                elif op == 'halt':
+                    ret = "return -1"
+                    ending = ('goto', -1)
+            src.append("    " + ret)
+            self.blockOps.append(ops)
+            self.blockEnds.append(ending)
+        self.blockCounts = [0] * len(leaders)
+        ns = {'counts': self.blockCounts}
+        exec("\n".join(src), ns)
+        self.blocks     = [ns["b%d" % b] for b in range(len(leaders))]
+        self.blockLens  = [(leaders[b+1] if b+1 < len(leaders) else len(self.instrs)) - l for b,l in enumerate(leaders)]
+        self.blockLbls  = [[self.instrs[i][0] for i in range(l, leaders[b+1] if b+1 < len(leaders) else len(self.instrs))] for b,l in enumerate(leaders)]
+        self.startBlock = blockOf[target(self.startLbl)]
+        self.slots      = list(slots)
+        self.source     = "\n".join(src)
 
-    # var1 = var2 % var3
-    def mod(self, var1:str, var2:str, var3:str):
-        self.vars[str(var1)] = self.getVal(var2) % self.getVal(var3)
-        return 0
+    # Counts the executions of each label from now on
+    def enableProfile(self):
+        self.profile = True
+        self.blocks  = None
 
-    # var1 = var2 * var3
-    def mul(self, var1:str, var2:str, var3:str):
-        self.vars[str(var1)] = self.getVal(var2) * self.getVal(var3)
-        return 0
+    # Returns the executions per label since the last call and resets them
+    def takeProfile(self) -> dict[str,int]:
+        counts = {lbl: 0 for lbl,_,_ in self.instrs}
+        if self.blocks is not None:
+            for b,lbls in enumerate(self.blockLbls):
+                for lbl in lbls:
+                    counts[lbl] += self.blockCounts[b]
+                self.blockCounts[b] = 0
+        return counts
 
-    def goto(self, lbl:str):
-        self.currLbl = lbl
-        return 0
+    # Returns the operand tokens (variables, constants) of an instruction
+    @staticmethod
+    def operands(op:str, args:tuple) -> list[str]:
+        if op in ['goto', 'halt']:
+            return []
+        if op == 'ifGoto':
+            return [args[1], args[3]]
+        return list(args)
 
-    def pred(self,t:list[str]):
-        if len(t) != 3:
-            raise ValueError("Predicate (%s) has to consist of exactly three tokens" % str(t))
-        elif t[1] == '=':
-            return lambda: self.getVal(t[0]) == self.getVal(t[2])
-        elif t[1] == '!=':
-            return lambda: self.getVal(t[0]) != self.getVal(t[2])
-        elif t[1] == '<=':
-            return lambda: self.getVal(t[0]) <= self.getVal(t[2])
-        elif t[1] == '>=':
-            return lambda: self.getVal(t[0]) >= self.getVal(t[2])
-        elif t[1] == '<':
-            return lambda: self.getVal(t[0]) <  self.getVal(t[2])
-        elif t[1] == '>':
-            return lambda: self.getVal(t[0]) >  self.getVal(t[1])
-        else:
-            raise ValueError("Predicate (%s) has to be of ['=', '!=', '<', '>', '<=', '>=']" % str(t))
-
-    def ifGoto(self, pred:Callable[[],bool], lbl:str):
-        if pred():
-            self.goto(lbl)
-        else:
-            pass
-        return 0
+    # Runs the compiled program (compiled on first use). Returns the value of
+    # the return variable (None if the run is undecided) and the variables.
+    def run(self,i:int):
+        if self.blocks is None:
+            self.compile()
+        blocks, lens = self.blocks, self.blockLens
+        r = [0] * len(self.slots)
+        r[0] = int(i)
+        b = self.startBlock
+        self.undecided = None
+        # all budgets are checked once steps reaches nextEvent
+        limit     = self.maxSteps + 1 if self.maxSteps is not None else math.inf
+        deadline  = time.monotonic() + self.timeout if self.timeout is not None else None
+        nextPoll  = 1 << 14 if deadline is not None else math.inf
+        nextCycle = self.cycleCheck if self.cycleCheck else math.inf
+        nextEvent = min(limit, nextPoll, nextCycle)
+        seen  = set()
+        steps = 0
+        while b >= 0:
+            steps += lens[b]
+            if steps >= nextEvent:
+                if steps >= limit:
+                    self.undecided = 'maxSteps'
+                    break
+                if steps >= nextPoll:
+                    nextPoll += 1 << 14
+                    if time.monotonic() > deadline:
+                        self.undecided = 'timeout'
+                        break
+                if steps >= nextCycle:
+                    nextCycle += self.cycleCheck
+                    state = (b, tuple(r))
+                    if state in seen:
+                        self.undecided = 'loop'
+                        break
+                    seen.add(state)
+                nextEvent = min(limit, nextPoll, nextCycle)
+            b = blocks[b](r)
+        self.steps = steps
+        self.vars = dict(zip(self.slots, r))
+        if self.undecided is not None:
+            return None, self.vars
+        return self.vars[self.retVar], self.vars
+
+    # runBatch can't stop single lanes by time or remember their states
+    def batchable(self) -> bool:
+        return self.timeout is None and not self.cycleCheck
+
+    # Runs the compiled program on many inputs at once (SIMT style): every
+    # variable is an int64 numpy array with one lane per input and each lane
+    # has its own block index (-1 -> halted). Blocks are executed for all lanes
+    # currently in them. Returns the results of run for each input or None for
+    # inputs which have to be run by run instead (int64 overflow, division by
+    # zero and the last few lanes of a batch, which would need many rounds on
+    # tiny arrays). Lanes over the step budget return (None, vars) like run.
+    def runBatch(self, inputs:list[int]) -> list:
+        if self.blocks is None:
+            self.compile()
+        lo, hi = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+        res = [None] * len(inputs)
+        consts = [v for ops in self.blockOps for op in ops for isC,v in op[2:] if isC] + \
+                 [v for e in self.blockEnds if e[0] == 'if' for isC,v in e[2:4] if isC]
+        if any(v > hi for v in consts):
+            return res
+        idx = [k for k,i in enumerate(inputs) if lo <= i <= hi]
+        if not idx:
+            return res
+        n = len(idx)
+        regs  = np.zeros((len(self.slots), n), dtype=np.int64)
+        regs[0] = [inputs[k] for k in idx]
+        pc    = np.full(n, self.startBlock, dtype=np.intp)
+        steps = np.zeros(n, dtype=np.int64)
+        bad   = np.zeros(n, dtype=bool)
+        over  = np.zeros(n, dtype=bool)
+        # executions per block and lane, only added for lanes which aren't rerun
+        counts = np.zeros((len(self.blocks), n), dtype=np.int64) if self.profile else None
+        cmps  = {'==': operator.eq, '!=': operator.ne, '<=': operator.le, '>=': operator.ge, '<': operator.lt, '>': operator.gt}
+
+        tail = max(16, n // 64)
+        with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            while True:
+                act = np.flatnonzero(pc >= 0)
+                if len(act) == 0:
+                    break
+                if len(act) <= tail and len(act) < n:
+                    bad[act] = True
+                    break
+                at = pc[act]
+                for b in range(len(self.blocks)):
+                    ls = act[at == b]
+                    if len(ls) == 0:
+                        continue
+                    steps[ls] += self.blockLens[b]
+                    if self.maxSteps is not None:
+                        out = steps[ls] > self.maxSteps
+                        over[ls[out]] = True
+                        pc[ls[out]] = -1
+                        ls = ls[~out]
+                    if self.profile:
+                        counts[b, ls] += 1
+                    # variables of the lanes in this block (gathered on first use)
+                    r, written = {}, set()
+                    def get(o):
+                        if o[0]:
+                            return np.int64(o[1])
+                        if o[1] not in r:
+                            r[o[1]] = regs[o[1], ls]
+                        return r[o[1]]
+                    fail = False
+                    for op in self.blockOps[b]:
+                        written.add(op[1])
+                        if op[0] == 'assign':
+                            r[op[1]] = np.broadcast_to(get(op[2]), len(ls))
+                            continue
+                        x, y = get(op[2]), get(op[3])
+                        if op[0] == 'plus':
+                            z = x + y
+                            fail |= ((x ^ z) & (y ^ z)) < 0
+                        elif op[0] == 'minus':
+                            z = x - y
+                            fail |= ((x ^ y) & (x ^ z)) < 0
+                        elif op[0] == 'mul':
+                            z = x * y
+                            # conservative (close to the limit python ints are used as well)
+                            fail |= np.abs(np.float64(x) * y) >= 2.0**62
+                        elif op[0] == 'div':
+                            fail |= (y == 0) | ((x == lo) & (y == -1))
+                            z = x // np.where(y == 0, 1, y)
+                        else:
+                            fail |= y == 0
+                            z = x % np.where(y == 0, 1, y)
+                        r[op[1]] = z
+                    e = self.blockEnds[b]
+                    if e[0] == 'goto':
+                        nxt = np.full(len(ls), e[1], dtype=np.intp)
+                    else:
+                        nxt = np.where(np.broadcast_to(cmps[e[1]](get(e[2]), get(e[3])), len(ls)), e[4], e[5])
+                    if fail is not False:
+                        nxt[fail] = -1
+                        bad[ls[fail]] = True
+                    for v in written:
+                        regs[v, ls] = r[v]
+                    pc[ls] = nxt
 
-    def halt(self):
-        return 1
+        if self.profile:
+            for b,c in enumerate(counts[:, ~bad].sum(axis=1)):
+                self.blockCounts[b] += int(c)
+        ret = self.slots.index(self.retVar)
+        for j,k in enumerate(idx):
+            if not bad[j]:
+                vals = [int(v) for v in regs[:, j]]
+                res[k] = (None if over[j] else vals[ret], dict(zip(self.slots, vals)))
+        return res
 
-    def addFunction(self, lbl:str, func:Callable):
-        if str(lbl) in self.funcs:
+    # Adds the instruction lbl, op is one of plus, minus, div, mod, mul,
+    # assign, goto, ifGoto, halt and args are its tokens (for ifGoto: label,
+    # operand, comparison, operand)
+    def addInstr(self, lbl:str, op:str, *args:str):
+        if str(lbl) in self.labels:
             print("Error: Label already defined")
             return -1
-        self.funcs[str(lbl)] = func
+        self.labels.add(str(lbl))
+        self.instrs.append((str(lbl), op, args))
+        self.blocks = None
         return 0
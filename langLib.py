@@ -0,0 +1,246 @@
+# Copyright (c) 2024 Lukas Heindl
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import random
+import itertools
+import numpy as np
+from typing import Callable, Iterable
+from pyformlang.cfg import CFG, Terminal
+from ele import Words, uniqueConcat
+
+# Words of a given length in a language (accepted=True) or its complement
+# (accepted=False) over symbols: count, enumerate or sample them uniformly.
+# Words are the concatenation of their symbols.
+
+class DfaLanguage:
+    exact = True # count is exact
+
+    # table/accept/start of a complete DFA (see AutomataRegul.dfa), the first
+    # len(symbols) columns of table belong to symbols
+    def __init__(self, table, accept, start:int, symbols:list[str]):
+        self.symbols = symbols
+        self.table   = [[int(d) for d in row[:len(symbols)]] for row in table]
+        self.start   = int(start)
+        # counts[acc][n][q]: amount of words of length n leading from q to an
+        # accepting (acc) or rejecting (not acc) state, filled on demand
+        self.counts  = {True: [[int(bool(a)) for a in accept]], False: [[int(not a) for a in accept]]}
+        # matrix[q][d]: amount of symbols leading from q to d
+        self.matrix  = np.zeros((len(self.table), len(self.table)), dtype=object)
+        for q,row in enumerate(self.table):
+            for d in row:
+                self.matrix[q][d] += 1
+
+    def _counts(self, n:int, accepted:bool) -> list[list[int]]:
+        c = self.counts[accepted]
+        while len(c) <= n:
+            prev = c[-1]
+            c.append([sum(prev[d] for d in row) for row in self.table])
+        return c
+
+    # exact amount of words of length n, lengths far beyond the ones computed
+    # so far are jumped to via matrix powers (start row of matrix^n)
+    def count(self, n:int, accepted:bool=True) -> int:
+        c = self.counts[accepted]
+        if n - len(c) > len(self.table)**2:
+            row = np.linalg.matrix_power(self.matrix, n)[self.start]
+            return int(sum(row[q] for q,f in enumerate(c[0]) if f))
+        return self._counts(n, accepted)[n][self.start]
+
+    # upper bound of count which is cheap to compute
+    def upper(self, n:int, accepted:bool=True) -> int:
+        return self.count(n, accepted)
+
+    # all words of length n in order of the symbols (subtrees without words are
+    # not visited)
+    def enumerate(self, n:int, accepted:bool=True) -> Iterable[str]:
+        c = self._counts(n, accepted)
+        prefix = []
+        def rec(q:int, i:int):
+            if i == 0:
+                yield "".join(prefix)
+                return
+            for a,d in enumerate(self.table[q]):
+                if c[i-1][d]:
+                    prefix.append(self.symbols[a])
+                    yield from rec(d, i-1)
+                    prefix.pop()
+        if c[n][self.start]:
+            yield from rec(self.start, n)
+
+    # uniformly chosen word of length n (None if there is none)
+    def sample(self, n:int, accepted:bool=True, rng=random) -> str:
+        c = self._counts(n, accepted)
+        q = self.start
+        if c[n][q] == 0:
+            return None
+        word = []
+        for i in range(n, 0, -1):
+            r = rng.randrange(c[i][q])
+            for a,d in enumerate(self.table[q]):
+                if r < c[i-1][d]:
+                    word.append(self.symbols[a])
+                    q = d
+                    break
+                r -= c[i-1][d]
+        return "".join(word)
+
+class CnfLanguage:
+    exact = False # see count
+
+    # words of a grammar in CNF (epsilon: whether the original grammar
+    # generates the empty word). Samples are uniform over the derivations,
+    # which is uniform over the words only for unambiguous grammars. The
+    # complement of a context free language is not context free in general,
+    # so rejected words are enumerated/sampled over all words and filtered by
+    # contains (membership of a word, e.g. Cfg.contains). Sets of words are
+    # only built for enumerating, i.e. if there are few derivations.
+    def __init__(self, cnf:CFG, epsilon:bool, symbols:list[str], contains:Callable[[str],bool]):
+        self.symbols  = symbols
+        self.epsilon  = epsilon
+        self.contains = contains
+        self.start   = cnf.start_symbol
+        self.terms   = {} # A -> [terminal] with A -> terminal
+        self.pairs   = {} # A -> [(B,C)] with A -> B C
+        for p in cnf.productions:
+            # the CNF of pyformlang might keep unit productions like B -> B,
+            # they don't derive any word
+            if len(p.body) == 1 and isinstance(p.body[0], Terminal):
+                self.terms.setdefault(p.head, []).append(p.body[0].value)
+            elif len(p.body) == 2:
+                self.pairs.setdefault(p.head, []).append((p.body[0], p.body[1]))
+        self.derivs = [{}] # [n][A] -> amount of derivations of words of length n
+        self.words  = {} # (A,n) -> set of the words of length n
+
+    # filled length by length (no recursion for long words)
+    def derivations(self, a, n:int) -> int:
+        d = self.derivs
+        while len(d) <= n:
+            m = len(d)
+            if m == 1:
+                d.append({h:len(ts) for h,ts in self.terms.items()})
+            else:
+                d.append({h:sum(d[k].get(b, 0) * d[m-k].get(c, 0) for b,c in ps for k in range(1, m)) for h,ps in self.pairs.items()})
+        return d[n].get(a, 0)
+
+    def wordSet(self, a, n:int) -> set:
+        if (a,n) not in self.words:
+            if n == 1:
+                ws = set(self.terms.get(a, []))
+            else:
+                ws = set()
+                for b,c in self.pairs.get(a, []):
+                    for k in range(1, n):
+                        if self.derivations(b, k) and self.derivations(c, n-k):
+                            ws.update(u+v for u in self.wordSet(b, k) for v in self.wordSet(c, n-k))
+            self.words[(a,n)] = ws
+        return self.words[(a,n)]
+
+    def accepted(self, n:int) -> set:
+        if n == 0:
+            return {""} if self.epsilon else set()
+        return self.wordSet(self.start, n)
+
+    # amount of derivations (dynamic programming over the CNF), which is exact
+    # for unambiguous grammars and an upper bound of the words in L otherwise
+    # (a lower bound of the rejected ones)
+    def count(self, n:int, accepted:bool=True) -> int:
+        c = self.upper(n, True)
+        return c if accepted else max(0, len(self.symbols)**n - c)
+
+    def upper(self, n:int, accepted:bool=True) -> int:
+        if not accepted:
+            return len(self.symbols)**n
+        if n == 0:
+            return int(self.epsilon)
+        return self.derivations(self.start, n)
+
+    # the accepted words are collected in sets, only use this if upper is small
+    def enumerate(self, n:int, accepted:bool=True) -> Iterable[str]:
+        if accepted:
+            yield from sorted(self.accepted(n))
+            return
+        for w in itertools.product(self.symbols, repeat=n):
+            w = "".join(w)
+            if not self.contains(w):
+                yield w
+
+    # rejected words are drawn from all words until one is rejected (at most
+    # tries times, None if none was found)
+    def sample(self, n:int, accepted:bool=True, rng=random, tries:int=1000) -> str:
+        if not accepted:
+            for _ in range(tries):
+                w = "".join(rng.choice(self.symbols) for _ in range(n))
+                if not self.contains(w):
+                    return w
+            return None
+        if n == 0:
+            return "" if self.epsilon else None
+        if self.derivations(self.start, n) == 0:
+            return None
+        return self._sample(self.start, n, rng)
+
+    def _sample(self, a, n:int, rng) -> str:
+        if n == 1:
+            return rng.choice(self.terms[a])
+        r = rng.randrange(self.derivations(a, n))
+        for b,c in self.pairs.get(a, []):
+            for k in range(1, n):
+                d = self.derivations(b, k) * self.derivations(c, n-k)
+                if r < d:
+                    return self._sample(b, k, rng) + self._sample(c, n-k, rng)
+                r -= d
+
+# rows (length, all words, in L, not in L, density of L) for the lengths in
+# [startLen,endLen)
+def densityTable(lang, startLen:int, endLen:int) -> list[tuple]:
+    rows = []
+    for l in range(startLen, endLen):
+        total = len(lang.symbols)**l
+        acc   = lang.count(l, True)
+        rows.append((l, total, acc, total-acc, acc/total))
+    return rows
+
+# words of each length in [startLen,endLen) for each of the classes
+# (True -> accepted, False -> rejected). If there are at most cntPerLength
+# words of a class (by upper) all of them are generated, otherwise
+# cntPerLength are sampled uniformly (rejected words of grammars might miss
+# some if they are rare, the total is too big then).
+def genLanguageWords(lang, startLen:int, endLen:int, cntPerLength:Callable[[int,int],int], classes:list[bool], rng=random) -> Words:
+    parts = [] # enumerated words (list) or amount of samples (int) per length and class
+    for l in range(startLen, endLen):
+        for acc in classes:
+            want = cntPerLength(l, len(lang.symbols))
+            if lang.upper(l, acc) <= want:
+                parts.append((l, acc, list(lang.enumerate(l, acc))))
+            else:
+                parts.append((l, acc, want))
+    def gen():
+        for l,acc,p in parts:
+            if isinstance(p, list):
+                yield from p
+                continue
+            for _ in range(p):
+                w = lang.sample(l, acc, rng)
+                if w is not None:
+                    yield w
+    count = sum(len(p) if isinstance(p, list) else p for _,_,p in parts)
+    distinct = all(isinstance(p, list) for _,_,p in parts) and uniqueConcat(lang.symbols)
+    return Words(gen(), count, distinct)
@@ -31,8 +31,15 @@ from regex import RegularExpression
 from tm import Ndtm
 from goto import Goto
 from ele import genRandomWords
+from langLib import genLanguageWords, densityTable
+from terminaltables import SingleTable
+from cache import Cache
+from output import ResultWriter
+from sweep import SweepState, sweepParams, shards, genShard, parseShard
 import subprocess
 import os
+import json
+from functools import partial
 
 import config
 
@@ -45,6 +52,42 @@ def askOverwrite(f:str, yes:bool) -> bool:
             return False
     return True
 
+# loads the element specified by args (used by the workers of --jobs as well)
+def loadEle(args, verbose:int):
+    if args.type in ['fa', 'dfa', 'nfa']:
+        ele = AutomataRegul.loadYaml(args.inFile, verbose)
+    elif args.type in ['cfg']:
+        ele = Cfg.loadYaml(args.inFile, verbose)
+        ele.cyk_on_sim = args.cyk # set if cyk should be executed when simulating
+        ele.cyk_incremental = args.cykIncremental
+        ele.parser = "earley" if args.earley else "cyk"
+    elif args.type in ['pda']:
+        ele = Pda.loadYaml(args.inFile, verbose)
+    elif args.type in ['re']:
+        ele = RegularExpression.loadYaml(args.inFile, verbose)
+    elif args.type in ['tm']:
+        ele = Ndtm.loadYaml(args.inFile, verbose)
+        ele.ndtm.maxSteps    = args.maxSteps if args.maxSteps > 0 else None
+        ele.ndtm.maxFrontier = args.maxFrontier if args.maxFrontier > 0 else None
+        ele.ndtm.parallel    = args.tmParallel
+        if args.profile:
+            ele.ndtm.enableProfile()
+    elif args.type in ['goto']:
+        ele = Goto.loadYaml(args.inFile, verbose)
+        ele.goto.maxSteps   = args.maxSteps if args.maxSteps > 0 else None
+        ele.goto.timeout    = args.timeout if args.timeout > 0 else None
+        ele.goto.cycleCheck = args.cycleCheck if args.cycleCheck > 0 else None
+        if args.profile:
+            ele.goto.enableProfile()
+    else:
+        quit(-1)
+
+    if ele.cacheable and not args.no_cache:
+        Cache().attach(ele, args.inFile, args.type + ("-earley" if args.earley else ""))
+    elif ele.cacheable:
+        ele.compile()
+    return ele
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
             description="Simulate an CFG/FA with either given or random words. The CFG/FA is read from a YAML file. For a doc on this, see the README.md\nBy default the words are simply simulated and the result is printed. Then some sort of tex code can be printed and dot code is generated (see the parameter).",
@@ -62,14 +105,58 @@ if __name__ == "__main__":
     parser.add_argument("--yes", "-y", help="Answer 'yes' to overwrite questions -> programm is non interactive", action='store_true')
     parser.add_argument("--unique", "-u", help="Test words only once to get a more expressive stat. Note that NO additional Words are beeing generated (might cause a deadlock) if there are duplicates. The sample size is just smaller.", action='store_true')
     parser.add_argument("--cyk", help="Generate CYK table for words (be carefull, this might produce a lot of output when running not with a fixed input set)", action='store_true')
-    parser.add_argument("--mini", help="Generate minimization-table for DFA (be carefull, this might produce a lot of output when running not with a fixed input set)", action='store_true')
+    parser.add_argument("--cykIncremental", help="With --cyk only compute and print the diagonals of the symbols after the prefix shared with the previously printed word (the table of the prefix is reused, e.g. for genAll)", action='store_true')
+    parser.add_argument("--earley", help="Parse CFG words with an Earley parser on the original productions (no CNF needed, syntax trees and derivations use the original productions)", action='store_true')
+    parser.add_argument("--maxSteps", help="Maximum amount of configurations a TM explores/commands a GOTO program executes per word before the word is reported as undecided, 0 -> unlimited [DEFAULT: %(default)s]", type=int, default=10**7)
+    parser.add_argument("--maxFrontier", help="Maximum amount of pending configurations of a nondeterministic TM before the word is reported as undecided, 0 -> unlimited [DEFAULT: %(default)s]", type=int, default=10**6)
+    parser.add_argument("--timeout", help="Maximum amount of seconds a GOTO program runs per input before the input is reported as undecided, 0 -> unlimited [DEFAULT: %(default)s]", type=float, default=0)
+    parser.add_argument("--cycleCheck", help="Remember the state of a GOTO program every N steps, reaching a remembered state again proves an endless loop (reported as undecided), 0 -> off [DEFAULT: %(default)s]", type=int, default=0, metavar="N")
+    parser.add_argument("--tmParallel", help="Search the configurations of nondeterministic TMs with N worker processes (level by level, deduplicated per worker) [DEFAULT: sequential]", type=int, default=0, metavar="N")
+    parser.add_argument("--profile", help="Count the executions per label (goto) or the transitions taken per state and symbol (tm) over all words, print them and write them as json to FILE. The tex output is annotated with the counts", metavar="FILE")
+    parser.add_argument("--output-format", help="Write one record per word (word, accepted, check result) in this format to --output instead of printing the words", choices=ResultWriter.formats, dest="outputFormat")
+    parser.add_argument("--output", help="File the records of --output-format are written to", dest="output")
+    parser.add_argument("--output-failing", help="Only write the records of words failing the check (or undecided ones)", action='store_true', dest="outputFailing")
+    parser.add_argument("--output-payload", help="Add the rest of the simulation result (trees, tapes, variables, ...) to the records", action='store_true', dest="outputPayload")
+    parser.add_argument("--words", help="Generate the words from the language itself (fa/dfa/nfa/re/cfg): 'accepted'/'rejected' words or 'both' per length, all of them if there are at most cntPerLength, otherwise uniformly sampled. 'random' uses genRandomWords (or the checks of the yaml file). Takes precedence over the checks [DEFAULT: %(default)s]", choices=['random', 'accepted', 'rejected', 'both'], default='random')
+    parser.add_argument("--density", help="Print the exact amount of words in the language and in its complement per length (fa/dfa/nfa/re and cfg) and exit without simulating", action='store_true')
+    parser.add_argument("--state", help="Test all words of the lengths startLen to endLen in shards (like genAll) and checkpoint the done shards and the stats to this json file after every shard (see sweep.py for merging states)", metavar="FILE")
+    parser.add_argument("--resume", help="Continue the sweep of --state, shards which are done are skipped", action='store_true')
+    parser.add_argument("--shard", help="Only run every N-th shard of the sweep starting with the I-th one (0 <= I < N), e.g. to distribute a sweep over several machines [DEFAULT: 0/1]", type=parseShard, default=(0, 1), metavar="I/N")
+    parser.add_argument("--shardSize", help="Amount of words per shard of --state [DEFAULT: %(default)s]", type=int, default=100000)
+    parser.add_argument("--trie", help="Test all words of the lengths startLen to endLen (like genAll, also with --state) by traversing the trie of the words, every prefix is simulated only once and rejected subtrees are not simulated at all (fa/dfa/nfa/re and pda)", action='store_true')
+    parser.add_argument("--jobs", "-j", help="Simulate the words in JOBS worker processes (the output stays the same as with one job) [DEFAULT: %(default)s]", type=int, default=1)
+    parser.add_argument("--no-cache", help="Don't use the on-disk cache of compiled models (conversions like CFG -> CNF or regex -> epsilon NFA are redone on every run)", action='store_true')
+    parser.add_argument("--mini", help="Minimize the DFA (Hopcroft) and print the equivalence classes", action='store_true')
+    parser.add_argument("--miniTable", help="Additionally print the tutorial-style minimization-table steps (be carefull, this might produce a lot of output for bigger DFAs)", action='store_true')
 
     args = parser.parse_args()
+    if args.tmParallel > 1 and args.jobs > 1:
+        parser.error("--tmParallel can't be combined with --jobs (workers can't start workers)")
+    if args.profile and args.type not in ['goto', 'tm']:
+        parser.error("--profile is only available for goto and tm")
+    if (args.resume or args.shard != (0, 1)) and not args.state:
+        parser.error("--resume and --shard need --state")
+    if (args.state or args.trie) and (args.input or args.words != 'random'):
+        parser.error("--state and --trie can't be combined with --input or --words")
+    if args.input and args.words != 'random':
+        parser.error("--input can't be combined with --words")
+    if args.trie and args.jobs > 1:
+        parser.error("--trie can't be combined with --jobs")
+    if args.profile and args.tmParallel > 1:
+        parser.error("--profile can't be combined with --tmParallel")
+    if args.profile and not askOverwrite(args.profile, args.yes):
+        quit(1)
+    if (args.outputFormat is None) != (args.output is None):
+        parser.error("--output-format and --output have to be given together")
+    if args.output and not askOverwrite(args.output, args.yes):
+        quit(1)
 
+    ele = loadEle(args, args.verbose)
     if args.type in ['fa', 'dfa', 'nfa']:
-        ele = AutomataRegul.loadYaml(args.inFile, args.verbose)
         print("regex:", ele.toRegex())
         if args.mini: # minimize the FA (will fail if delta is not deterministic)
+            print("minimized regex:", ele.minimizeHopcroft().toRegex())
+        if args.miniTable:
             ele.minimize()
         if args.check:
             if hasattr(config, 'checkL_fa'):
@@ -79,8 +166,6 @@ if __name__ == "__main__":
         else:
             checkL = lambda _,u: True # function is not relevant if check is not set
     elif args.type in ['cfg']:
-        ele = Cfg.loadYaml(args.inFile, args.verbose)
-        ele.cyk_on_sim = args.cyk # set if cyk should be executed when simulating
         if args.check:
             if hasattr(config, 'checkL_cfg'):
                 checkL = config.checkL_cfg
@@ -89,7 +174,6 @@ if __name__ == "__main__":
         else:
             checkL = lambda _,u: True # function is not relevant if check is not set
     elif args.type in ['pda']:
-        ele = Pda.loadYaml(args.inFile, args.verbose)
         if args.check:
             if hasattr(config, 'checkL_pda'):
                 checkL = config.checkL_pda
@@ -98,7 +182,6 @@ if __name__ == "__main__":
         else:
             checkL = lambda _,u: True # function is not relevant if check is not set
     elif args.type in ['re']:
-        ele = RegularExpression.loadYaml(args.inFile, args.verbose)
         if args.check:
             if hasattr(config, 'checkL_re'):
                 checkL = config.checkL_re
@@ -107,7 +190,6 @@ if __name__ == "__main__":
         else:
             checkL = lambda _,u: True # function is not relevant if check is not set
     elif args.type in ['tm']:
-        ele = Ndtm.loadYaml(args.inFile, args.verbose)
         if args.check:
             if hasattr(config, 'checkL_tm'):
                 checkL = config.checkL_tm
@@ -116,7 +198,6 @@ if __name__ == "__main__":
         else:
             checkL = lambda _,u: True # function is not relevant if check is not set
     elif args.type in ['goto']:
-        ele = Goto.loadYaml(args.inFile, args.verbose)
         if args.check:
             if hasattr(config, 'checkL_goto'):
                 checkL = config.checkL_goto
@@ -124,35 +205,113 @@ if __name__ == "__main__":
                 raise Exception("checkL not implemented")
         else:
             checkL = lambda _,u: True # function is not relevant if check is not set
-    else:
-        quit(-1)
 
     if hasattr(config, 'cntPerLength'):
         cntPerLength = config.cntPerLength
     else:
         cntPerLength = lambda l, w: l+1
 
-    if args.input:
+    if args.density:
+        lang = ele.language()
+        if lang is None:
+            parser.error("--density is only available for fa, dfa, nfa, re and cfg")
+        # grammars count derivations, more than the words if it is ambiguous
+        tab = [["length", "words", "in L" if lang.exact else "in L (<=)", "not in L" if lang.exact else "not in L (>=)", "density" if lang.exact else "density (<=)"]]
+        for l,total,acc,rej,d in densityTable(lang, args.startLen, args.endLen):
+            tab.append([str(l), str(total), str(acc), str(rej), "%.6f" % d])
+        st = SingleTable(tab, title="Words per length")
+        for i in range(1, len(tab[0])):
+            st.justify_columns[i] = 'right'
+        print(st.table)
+        sys.exit(0)
+
+    if args.trie and ele.trieRoot(0) is None:
+        parser.error("--trie is only available for fa, dfa, nfa, re and pda")
+
+    results = None
+    if args.state:
+        # the order of the terminals depends on the hash seed, the indices of
+        # the shards have to mean the same in every process
+        terminals = sorted(ele.terminals)
+        params = sweepParams(args.inFile, args.type, args.startLen, args.endLen, terminals, args.shardSize)
+        if args.resume:
+            try:
+                state = SweepState.load(args.state, params)
+            except (OSError, ValueError) as e:
+                parser.error("can't resume: %s" % e)
+        else:
+            if not askOverwrite(args.state, args.yes):
+                quit(1)
+            state = SweepState(args.state, params)
+        todo = [x for x in shards(args.startLen, args.endLen, terminals, args.shardSize, args.shard) if x not in state.done]
+    elif args.trie:
+        gen = None
+        results = ele.trieSweep(args.startLen, args.endLen, ele.terminals)
+        l = sum(len(ele.terminals)**x for x in range(args.startLen, args.endLen))
+    elif args.input:
         print("Enter input, terminate with 'EOF', mostly sent by CTRL+D")
         print("Valid terminal symbols: ", ele.terminals)
         gen = sys.stdin.read().splitlines()
         print()
         l = len(gen)
+    elif args.words != 'random':
+        lang = ele.language()
+        if lang is None:
+            parser.error("--words %s is only available for fa, dfa, nfa, re and cfg" % args.words)
+        classes = {'accepted': [True], 'rejected': [False], 'both': [True, False]}[args.words]
+        gen = genLanguageWords(lang, startLen=args.startLen, endLen=args.endLen, cntPerLength=cntPerLength, classes=classes)
+        l = len(gen)
     elif ele.checks != []:
         gen = ele.checks
         l = len(gen)
     elif hasattr(config, 'genRandomWords'):
         gen = config.genRandomWords(startLen=args.startLen, endLen=args.endLen, cntPerLength=cntPerLength, terminals=ele.terminals)
-        l = 0
-        for x in range(args.startLen,args.endLen):
-            l += cntPerLength(x, len(ele.terminals))
+        if hasattr(gen, '__len__'): # Words (or a list)
+            l = len(gen)
+        else:
+            l = 0
+            for x in range(args.startLen,args.endLen):
+                l += cntPerLength(x, len(ele.terminals))
     else:
         gen = genRandomWords(startLen=args.startLen, endLen=args.endLen, cntPerLength=cntPerLength, terminals=ele.terminals)
-        l = 0
-        for x in range(args.startLen,args.endLen):
-            l += cntPerLength(x, len(ele.terminals))
+        l = len(gen)
+
+    writer = ResultWriter(args.output, args.outputFormat, onlyFailing=args.outputFailing, payload=args.outputPayload,
+            append=args.resume and os.path.exists(args.output)) if args.output else None
+    if args.state:
+        for k,(x,lo,hi) in enumerate(todo):
+            cnt = ele.checkAny(genShard(x, lo, hi, terminals), checkL=checkL, check=args.check, l=hi-lo, progress=args.progress, unique=False,
+                    jobs=args.jobs, loader=partial(loadEle, args, 0), writer=writer, stats=False,
+                    results=ele.trieResults(x, lo, hi, terminals) if args.trie else None)
+            # the records of the shard have to be on disk before it is marked
+            # as done
+            if writer is not None:
+                writer.flush()
+            state.add((x,lo,hi), *cnt)
+            state.save()
+            if args.progress:
+                print("Shard %d/%d done (length %d, words %d-%d)" % (k+1, len(todo), x, lo, hi-1))
+        state.save()
+        print("\nStats (eval of automata):")
+        print("True", state.stats["True"])
+        print("False", state.stats["False"])
+        if state.stats["Undecided"] > 0:
+            print("Undecided", state.stats["Undecided"])
+    else:
+        # distinct words (e.g. genAll) don't need to be filtered for --unique
+        unique = args.unique and not getattr(gen, 'distinct', False)
+        ele.checkAny(gen,checkL=checkL, check=args.check, l=l, progress=args.progress, unique=unique,
+                jobs=args.jobs, loader=partial(loadEle, args, 0), writer=writer, results=results)
+    if writer is not None:
+        writer.close()
 
-    ele.checkAny(gen,checkL=checkL, check=args.check, l=l, progress=args.progress, unique=args.unique)
+    if args.profile:
+        counts = ele.profileCounts()
+        print("\nProfile (%s):" % ("executions per label" if args.type == 'goto' else "transitions taken per state,symbol"))
+        for k,cnt in sorted(counts.items(), key=lambda x: (-x[1], x[0])):
+            print("%12d %s" % (cnt, k))
+        with open(args.profile, 'w') as f:
+            json.dump({"type": args.type, "file": args.inFile, "counts": counts}, f, indent=2)
 
     if args.outBase == "+":
         f = sys.stderr
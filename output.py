@@ -0,0 +1,66 @@
+# Copyright (c) 2024 Lukas Heindl
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import csv
+import json
+
+# Writes one record per simulated word (word, accepted, result of checkL and
+# optionally the rest of the simulation result) as json lines or csv. The file
+# is written with a big buffer, nothing is formatted for humans.
+class ResultWriter:
+    formats = ['jsonl', 'csv']
+
+    # append: continue an existing file (no new csv header)
+    def __init__(self, path:str, fmt:str, onlyFailing:bool=False, payload:bool=False, append:bool=False):
+        if fmt not in self.formats:
+            raise ValueError("output format has to be one of %s" % str(self.formats))
+        self.fmt = fmt
+        self.onlyFailing = onlyFailing
+        self.payload = payload
+        self.f = open(path, 'a' if append else 'w', buffering=1024*1024, newline='')
+        if fmt == 'csv':
+            self.csv = csv.writer(self.f)
+            if not append:
+                self.csv.writerow(['word', 'accepted', 'check'] + (['payload'] if payload else []))
+
+    # check: result of checkL (None if not checked)
+    # failing are words where checkL failed and undecided ones
+    def write(self, word:str, s:tuple, check:bool):
+        accepted = s[0].item() if hasattr(s[0], 'item') else s[0] # numpy scalars
+        if self.onlyFailing and check is not False and accepted is not None:
+            return
+        if self.fmt == 'jsonl':
+            rec = {'word': word, 'accepted': accepted, 'check': check}
+            if self.payload:
+                rec['payload'] = [str(x) for x in s[1:]]
+            self.f.write(json.dumps(rec) + "\n")
+        else:
+            row = [word, accepted, check]
+            if self.payload:
+                row.append(" ".join(str(x) for x in s[1:]))
+            self.csv.writerow(row)
+
+    # everything written so far is on disk afterwards
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
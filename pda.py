@@ -20,8 +20,8 @@
 
 from pyformlang.pda import PDA, State, StackSymbol, Symbol, Epsilon
 from ele import Ele
+from pdaLib import PdaChart
 import yaml
-from cfg import Cfg
 
 def make_tuple(i:str):
     s = i.split(",")
@@ -34,22 +34,31 @@ class Pda(Ele):
         super().__init__(terminals=list(map(lambda x: x.value, aut.input_symbols)), checks=checks)
         self.pda = aut
         self.states = aut.states
-        self.cfg = None
         self.accepting = acc
+        self.compile()
+
+    def compile(self):
+        self.engine = PdaChart(self.pda, self.accepting)
+
+    # prefix sharing simulation (see Ele.trieResults), nodes are the charts
+    # (list of columns) of the prefix
+    def trieRoot(self, l:int):
+        return [self.engine.initial()]
+
+    def trieStep(self, node, c:str):
+        return node + [self.engine.column(node, c)]
+
+    def trieDead(self, node) -> bool:
+        return not self.engine.extendable(node) and not self.engine.accepts(node)
+
+    def trieResult(self, node) -> tuple:
+        return (self.engine.accepts(node),[],[])
 
-    # returns (accepted,texTree,leftDeriv)
     # returns (accepted,[],[])
+    # the configurations are explored frame by frame (see pdaLib), which
+    # terminates for epsilon loops and stacks growing without bound
     def simulate(self, i:str):
-        if self.cfg is None:
-            if self.accepting:
-                print("final -> empt Stack -> cfg")
-                self.cfg = Cfg(cfg=self.pda.to_empty_stack().to_cfg(),checks=self.checks)
-            else:
-                print("empt Stack -> cfg")
-                self.cfg = Cfg(cfg=self.pda.to_cfg(),checks=self.checks)
-        accepted = self.cfg.simulate(i)[0]
-        r = ([],[])
-        return accepted,r[0],r[1]
+        return self.engine.accepts(self.engine.chart(i)),[],[]
 
     def toTikz(self,f) -> bool:
         # preamble
@@ -142,7 +151,6 @@ class Pda(Ele):
 
         accepting = False
         if 'accepting' in d:
-            print("Note that acceptance on final state is not tested, yet")
             for a in d['accepting']:
                 pda.add_final_state(str(a))
             accepting = True
@@ -0,0 +1,127 @@
+# Copyright (c) 2024 Lukas Heindl
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pyformlang.pda import PDA, Epsilon
+
+# Earley style recognizer for PDAs working on frames instead of whole stacks,
+# which keeps it polynomial in the length of the word (stacks growing via
+# epsilon moves don't matter). A frame (q,X) predicted in column i is a
+# reachable configuration in state q with X on top after reading word[:i]. An
+# item (q,X,i,t,d,r) is inside such a frame: transition t of (q,X) was taken,
+# the first d pushed symbols are popped again and the PDA is in state r. With
+# d == len(push) the frame is popped ending in r, which advances the items
+# waiting for it (like the completion of a variable in earleyLib).
+class Column:
+    def __init__(self):
+        self.items   = set()
+        self.frames  = set() # predicted (q,X)
+        self.waiting = {}    # (q,X) -> items waiting for the frame to be popped
+        self.done    = {}    # (q,X) -> end states of frames predicted and popped here
+        self.scans   = {}    # symbol -> items of the next column after reading it
+        self.top     = set() # end states of the initial frame (-> empty stack)
+
+class PdaChart:
+    # finalState: accept by final state (otherwise by empty stack)
+    def __init__(self, pda:PDA, finalState:bool):
+        self.trans = {} # (q,X) -> [(symbol (None -> epsilon), dst, pushed symbols top first)]
+        for (src,sym,top),(dst,push) in pda._transition_function:
+            self.trans.setdefault((src.value, top.value), []).append((None if isinstance(sym, Epsilon) else sym.value, dst.value, tuple(x.value for x in push)))
+        self.start      = (pda.start_state.value, pda._start_stack_symbol.value)
+        self.finals     = {x.value for x in pda.final_states}
+        self.finalState = finalState
+
+    # column before reading anything
+    def initial(self) -> Column:
+        col = Column()
+        self._close([], col, [], [self.start])
+        return col
+
+    # column after reading c
+    def column(self, chart:list[Column], c:str) -> Column:
+        col = Column()
+        todo = []
+        for item in chart[-1].scans.get(c, []):
+            if item not in col.items:
+                col.items.add(item)
+                todo.append(item)
+        self._close(chart, col, todo, [])
+        return col
+
+    def chart(self, word:str) -> list[Column]:
+        chart = [self.initial()]
+        for c in word:
+            chart.append(self.column(chart, c))
+        return chart
+
+    def accepts(self, chart:list[Column]) -> bool:
+        last = chart[-1]
+        if self.finalState:
+            return any(q in self.finals for q,_ in last.frames) or any(r in self.finals for r in last.top)
+        return len(last.top) > 0
+
+    # if any longer word with the prefix of chart might be accepted
+    def extendable(self, chart:list[Column]) -> bool:
+        return len(chart[-1].scans) > 0
+
+    # chart: the columns before col
+    def _close(self, chart:list[Column], col:Column, todo:list, predictions:list):
+        j = len(chart)
+        def add(item):
+            if item not in col.items:
+                col.items.add(item)
+                todo.append(item)
+        def predict(q, x):
+            if (q,x) in col.frames:
+                return
+            col.frames.add((q,x))
+            for t,(sym,dst,_) in enumerate(self.trans.get((q,x), ())):
+                item = (q,x,j,t,0,dst)
+                if sym is None:
+                    add(item)
+                else:
+                    col.scans.setdefault(sym, []).append(item)
+        for q,x in predictions:
+            predict(q, x)
+
+        while todo:
+            item = todo.pop()
+            q,x,i,t,d,r = item
+            push = self.trans[(q,x)][t][2]
+            if d < len(push):
+                y = push[d]
+                col.waiting.setdefault((r,y), []).append(item)
+                predict(r, y)
+                for e in col.done.get((r,y), ()):
+                    add((q,x,i,t,d+1,e))
+                continue
+            # the frame (q,x) of column i is popped ending in r
+            if i == 0 and (q,x) == self.start:
+                col.top.add(r)
+            if i == j:
+                ends = col.done.setdefault((q,x), set())
+                if r in ends:
+                    continue
+                ends.add(r)
+                waiters = list(col.waiting.get((q,x), ()))
+            else:
+                waiters = chart[i].waiting.get((q,x), ())
+            for q2,x2,i2,t2,d2,_ in waiters:
+                add((q2,x2,i2,t2,d2+1,r))
@@ -19,15 +19,42 @@
 # SOFTWARE.
 
 from pyformlang.regular_expression import Regex
+from pyformlang.regular_expression.regex_objects import Symbol, Epsilon
 import yaml
 
 from ele import Ele
+from fa import AutomataRegul
+from langLib import DfaLanguage
+from cache import dumpEnfa, loadEnfa
+
+def regexSymbols(re:Regex, acc:list):
+    if isinstance(re.head, Symbol) and not isinstance(re.head, Epsilon) and re.head.value not in acc:
+        acc.append(re.head.value)
+    for s in re.sons:
+        regexSymbols(s, acc)
+    return acc
 
 class RegularExpression(Ele):
+    cacheable = True
+    batchSize = AutomataRegul.batchSize
     
     def __init__(self, checks:list[str], re:Regex):
-        super().__init__(checks=checks, terminals=list(map(lambda x: x.value, re.to_epsilon_nfa().symbols)))
+        super().__init__(checks=checks, terminals=regexSymbols(re, []))
         self.re = re
+        self.fa = None
+
+    # the epsilon NFA of the regex is simulated via the compiled tables of
+    # AutomataRegul
+    def compile(self):
+        self.fa = AutomataRegul(checks=self.checks, aut=self.re.to_epsilon_nfa())
+
+    def dumpCompiled(self) -> dict:
+        if self.fa is None:
+            self.compile()
+        return {"enfa": dumpEnfa(self.fa.enfa)}
+
+    def loadCompiled(self, d:dict):
+        self.fa = AutomataRegul(checks=self.checks, aut=loadEnfa(d["enfa"]))
 
     @classmethod
     def loadYaml(cls, path:str, verbose:int):
@@ -55,7 +82,33 @@ class RegularExpression(Ele):
         print("regex does not toDot")
         return False
 
+    # the words are counted/sampled on the DFA of the FA
+    def language(self) -> DfaLanguage:
+        if self.fa is None:
+            self.compile()
+        return self.fa.language()
+
+    def trieRoot(self, l:int):
+        if self.fa is None:
+            self.compile()
+        return self.fa.trieRoot(l)
+
+    def trieStep(self, node, c:str):
+        return self.fa.trieStep(node, c)
+
+    def trieDead(self, node) -> bool:
+        return self.fa.trieDead(node)
+
+    def trieResult(self, node) -> tuple:
+        return self.fa.trieResult(node)
+
     # returns (accepted,[],[])
     def simulate(self, i:str):
-        l = [c for c in i]
-        return(self.re.accepts(l),[],[])
+        if self.fa is None:
+            self.compile()
+        return self.fa.simulate(i)
+
+    def simulateChunk(self, words:list[str]) -> list[tuple]:
+        if self.fa is None:
+            self.compile()
+        return self.fa.simulateChunk(words)
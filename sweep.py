@@ -0,0 +1,154 @@
+# Copyright (c) 2024 Lukas Heindl
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+# Exhaustive sweeps over all words of the lengths [startLen,endLen) in the order
+# of itertools.product (like config.genAll), split into shards (length,lo,hi)
+# of word indices. Every shard can be generated directly from its index, the
+# completed shards and the summed stats are checkpointed to a json state file
+# so a sweep can be resumed or distributed (--shard i/n) and merged afterwards.
+
+# word with the given index among the words of length l (the first symbol is
+# the most significant digit)
+def unrank(index:int, l:int, terminals:list[str]) -> list[int]:
+    k = len(terminals)
+    if not 0 <= index < k**l:
+        raise ValueError("index %d out of range for length %d" % (index, l))
+    digits = [0] * l
+    for p in range(l-1, -1, -1):
+        index, digits[p] = divmod(index, k)
+    return digits
+
+# words with the indices [lo,hi) of length l
+def genShard(l:int, lo:int, hi:int, terminals:list[str]):
+    k = len(terminals)
+    digits = unrank(lo, l, terminals) if lo < hi else []
+    for _ in range(lo, hi):
+        yield "".join(terminals[d] for d in digits)
+        # increment like an odometer
+        p = l-1
+        while p >= 0:
+            digits[p] += 1
+            if digits[p] < k:
+                break
+            digits[p] = 0
+            p -= 1
+
+# all shards of the sweep in word order, shard i of n gets every n-th one (the
+# lengths grow exponentially, so this is balanced better than ranges of shards)
+def shards(startLen:int, endLen:int, terminals:list[str], size:int, shard:tuple[int,int]=(0,1)) -> list[tuple[int,int,int]]:
+    ret = []
+    for l in range(startLen, endLen):
+        total = len(terminals)**l
+        for lo in range(0, total, size):
+            ret.append((l, lo, min(lo+size, total)))
+    i, n = shard
+    return ret[i::n]
+
+# identifies a sweep, the input is identified by its content so the shards can
+# be run on machines with different paths
+def sweepParams(inFile:str, kind:str, startLen:int, endLen:int, terminals:list[str], shardSize:int) -> dict:
+    with open(inFile, 'rb') as f:
+        h = hashlib.sha256(f.read()).hexdigest()
+    return {"input": h, "type": kind, "startLen": startLen, "endLen": endLen, "terminals": terminals, "shardSize": shardSize}
+
+# "i/n" -> (i,n) for --shard
+def parseShard(s:str) -> tuple[int,int]:
+    try:
+        i, n = map(int, s.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard has to be given as i/n")
+    if not 0 <= i < n:
+        raise argparse.ArgumentTypeError("shard i/n needs 0 <= i < n")
+    return i, n
+
+class SweepState:
+    def __init__(self, path:str, params:dict):
+        self.path   = path
+        self.params = params
+        self.done   = set()
+        self.stats  = {"True": 0, "False": 0, "Undecided": 0}
+
+    # raises a ValueError if the state belongs to another sweep
+    @classmethod
+    def load(cls, path:str, params:dict) -> "SweepState":
+        with open(path, "r") as f:
+            d = json.load(f)
+        if d["params"] != params:
+            raise ValueError("state %s belongs to another sweep: %s" % (path, d["params"]))
+        ret = cls(path, params)
+        ret.done  = set(map(tuple, d["done"]))
+        ret.stats = d["stats"]
+        return ret
+
+    def add(self, shard:tuple[int,int,int], cntTrue:int, cntFalse:int, cntUndecided:int):
+        self.done.add(shard)
+        self.stats["True"]      += cntTrue
+        self.stats["False"]     += cntFalse
+        self.stats["Undecided"] += cntUndecided
+
+    # written to a temporary file first, a killed process never leaves a broken
+    # state
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"params": self.params, "done": sorted(self.done), "stats": self.stats}, f)
+        os.replace(tmp, self.path)
+
+# merges the states of the shards of one sweep
+def merge(paths:list[str]) -> SweepState:
+    ret = None
+    for p in paths:
+        if ret is None:
+            with open(p, "r") as f:
+                ret = SweepState(None, json.load(f)["params"])
+        s = SweepState.load(p, ret.params)
+        if ret.done & s.done:
+            raise ValueError("%s overlaps with the other states" % p)
+        ret.done |= s.done
+        for k in ret.stats:
+            ret.stats[k] += s.stats[k]
+    return ret
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge the state files of the shards of a sweep and print the stats")
+    parser.add_argument("states", help="state files written with --state (and --shard)", nargs='+')
+    parser.add_argument("--out", help="write the merged state to this file (can be resumed without --shard)")
+    args = parser.parse_args()
+
+    s = merge(args.states)
+    p = s.params
+    missing = [x for x in shards(p["startLen"], p["endLen"], p["terminals"], p["shardSize"]) if x not in s.done]
+    print("Stats (eval of automata):")
+    print("True", s.stats["True"])
+    print("False", s.stats["False"])
+    if s.stats["Undecided"] > 0:
+        print("Undecided", s.stats["Undecided"])
+    print("Shards done: %d, missing: %d" % (len(s.done), len(missing)))
+    if args.out:
+        s.path = args.out
+        s.save()
+    sys.exit(0 if not missing else 1)
@@ -0,0 +1,36 @@
+import itertools
+import random
+from pyformlang.cfg import CFG, Variable, Epsilon
+from cfg import Cfg
+
+def bodies(cfg:CFG) -> set:
+    return {(p.head, tuple(x for x in p.body if not isinstance(x, Epsilon))) for p in cfg.productions}
+
+# every step replaces the leftmost variable by a body and the last form is w
+def checkDerivation(deriv:list, w:str, prods:set, start:Variable):
+    assert deriv[0] == [start]
+    for cur,nxt in zip(deriv, deriv[1:]):
+        k = next(k for k,x in enumerate(cur) if isinstance(x, Variable))
+        body = tuple(nxt[k:len(nxt)-len(cur)+k+1])
+        assert nxt[:k] == cur[:k] and nxt[len(nxt)-len(cur)+k+1:] == cur[k+1:]
+        assert (cur[k], body) in prods
+    assert [x.value for x in deriv[-1]] == list(w)
+
+def test_leftmost_derivation_is_the_word():
+    rnd = random.Random(3)
+    texts = ["S -> A B\nA -> a A | $\nB -> b B | $"]
+    for _ in range(60):
+        vs = ["S", "A", "B"][:rnd.randint(1, 3)]
+        texts.append("\n".join(v + " -> " + " | ".join(" ".join(rnd.choice(vs + ["a", "b"]) for _ in range(rnd.randint(0, 3))) or "$"
+                                                     for _ in range(rnd.randint(1, 3))) for v in vs))
+    for text in texts:
+        for parser in ["earley", "cyk"]:
+            c = Cfg(CFG.from_text(text), [])
+            c.parser = parser
+            c.compile()
+            prods = bodies(c.cfg if parser == "earley" else c.cnf)
+            for w in map("".join, itertools.chain.from_iterable(itertools.product("ab", repeat=n) for n in range(5))):
+                accepted,_,deriv = c.simulate(w)
+                assert accepted == c.contains(w), (text, parser, w)
+                if accepted and (w or parser == "earley"):
+                    checkDerivation(deriv, w, prods, c.cfg.start_symbol)
@@ -0,0 +1,22 @@
+import itertools
+import time
+from pyformlang.regular_expression import Regex
+from regex import RegularExpression
+
+# the DFA of the n-th symbol from the end being an a has 2^n states
+def nthFromEnd(n:int) -> RegularExpression:
+    return RegularExpression(re=Regex("(a|b)* a" + " (a|b)" * n), checks=[])
+
+def test_blowup_falls_back_to_nfa():
+    start = time.monotonic()
+    re = nthFromEnd(19)
+    re.compile()
+    assert re.simulateChunk(["ab", "a" * 20, "b" + "a" * 19, "ab" * 10]) == \
+        [(False,[],[]), (True,[],[]), (False,[],[]), (True,[],[])]
+    assert time.monotonic() - start < 5
+
+def test_batch_matches_simulate():
+    re = nthFromEnd(3)
+    re.compile()
+    words = ["".join(w) for l in range(8) for w in itertools.product("abc", repeat=l)]
+    assert re.simulateChunk(words) == [re.simulate(w) for w in words]
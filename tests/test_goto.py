@@ -0,0 +1,84 @@
+import operator
+import random
+from gotoLib import GOTO
+
+def program(instrs:list[tuple]) -> GOTO:
+    g = GOTO(startLbl="M1", inputVar="x", retVar="r")
+    for j,(op,*args) in enumerate(instrs):
+        g.addInstr("M%d" % (j+1), op, *args)
+    g.compile()
+    return g
+
+# '>' compares with the right operand (the interpreter compared with the
+# comparison token)
+def test_greater():
+    g = program([('ifGoto', 'M4', 'x', '>', '3'), ('assign', 'r', '0'), ('halt',), ('assign', 'r', '1')])
+    assert [g.run(i)[0] for i in range(6)] == [0, 0, 0, 0, 1, 1]
+    # None -> left to run
+    assert all(r is None or r[0] == e for r,e in zip(g.runBatch(list(range(6))), [0, 0, 0, 0, 1, 1]))
+
+# a jump in the last command is taken (the interpreter halted after it)
+def test_jump_in_last_command():
+    g = program([('minus', 'x', 'x', '1'), ('assign', 'r', 'x'), ('ifGoto', 'M1', 'x', '>', '0')])
+    assert [g.run(i)[0] for i in range(1, 6)] == [0] * 5
+    assert all(r is None or r[0] == 0 for r in g.runBatch(list(range(1, 6))))
+
+# reference: runs the instructions one by one on a dict of variables,
+# None if the program doesn't halt within limit instructions
+def interpret(g:GOTO, i:int, limit:int):
+    binops = {'plus': operator.add, 'minus': operator.sub, 'div': operator.floordiv, 'mod': operator.mod, 'mul': operator.mul}
+    cmps   = {'=': operator.eq, '!=': operator.ne, '<=': operator.le, '>=': operator.ge, '<': operator.lt, '>': operator.gt}
+    at = {lbl: j for j,(lbl,_,_) in enumerate(g.instrs)}
+    vs = {g.startVar: i}
+    val = lambda t: int(t) if t.isdigit() else vs.get(t, 0)
+    pc = at[g.startLbl]
+    for _ in range(limit):
+        if pc >= len(g.instrs):
+            return vs
+        _,op,args = g.instrs[pc]
+        pc += 1
+        if op in binops:
+            vs[args[0]] = binops[op](val(args[1]), val(args[2]))
+        elif op == 'assign':
+            vs[args[0]] = val(args[1])
+        elif op == 'goto':
+            pc = at[args[0]]
+        elif op == 'ifGoto' and cmps[args[2]](val(args[1]), val(args[3])):
+            pc = at[args[0]]
+        elif op == 'halt':
+            return vs
+    return None
+
+def test_run_matches_interpreter():
+    rnd = random.Random(11)
+    for _ in range(60):
+        n = rnd.randint(1, 8)
+        opnd = lambda: rnd.choice(['x', 'y', 'r', str(rnd.randint(0, 5))])
+        instrs = []
+        for _ in range(n):
+            op = rnd.choice(['plus', 'minus', 'div', 'mod', 'mul', 'assign', 'goto', 'ifGoto', 'ifGoto', 'halt'])
+            lbl = "M%d" % rnd.randint(1, n)
+            if op in ['div', 'mod']:
+                instrs.append((op, rnd.choice('xyr'), opnd(), str(rnd.randint(1, 5))))
+            elif op in ['plus', 'minus', 'mul']:
+                instrs.append((op, rnd.choice('xyr'), opnd(), opnd()))
+            elif op == 'assign':
+                instrs.append((op, rnd.choice('xyr'), opnd()))
+            elif op == 'goto':
+                instrs.append((op, lbl))
+            elif op == 'ifGoto':
+                instrs.append((op, lbl, opnd(), rnd.choice(['=', '!=', '<=', '>=', '<', '>']), opnd()))
+            else:
+                instrs.append((op,))
+        g = program(instrs)
+        g.maxSteps = 10**4
+        inputs = list(range(40))
+        batch = g.runBatch(inputs)
+        for i,b in zip(inputs, batch):
+            ref = interpret(g, i, 150)
+            if ref is None:
+                continue
+            ret, vs = g.run(i)
+            assert g.undecided is None
+            assert ret == ref.get('r', 0) and all(vs[v] == ref.get(v, 0) for v in vs), (instrs, i)
+            assert b is None or b == (ret, vs)
@@ -0,0 +1,31 @@
+import itertools
+from pyformlang.cfg import CFG
+from cfg import Cfg
+
+UNAMBIGUOUS = ["S -> a S b | $", "S -> a S | b S | a"]
+GRAMMARS = [
+    "S -> b B\nA -> B b a | b\nB -> B | b B A | b b", # CNF keeps B -> B
+    "S -> a S b | $",
+    "S -> a S | b S | a",
+    "S -> S S | a | b a",
+]
+
+def brute(c:Cfg, n:int) -> list[str]:
+    return sorted(w for w in map("".join, itertools.product(sorted(c.terminals), repeat=n)) if c.contains(w))
+
+def test_cnf_language_against_contains():
+    for text in GRAMMARS:
+        c = Cfg(CFG.from_text(text), [])
+        lang = c.language()
+        for n in range(7):
+            acc = brute(c, n)
+            assert sorted(lang.enumerate(n, True)) == acc, (text, n)
+            assert sorted(set(lang.enumerate(n, False)) | set(acc)) == sorted(map("".join, itertools.product(sorted(c.terminals), repeat=n)))
+            assert lang.count(n, True) >= len(acc)
+            if text in UNAMBIGUOUS:
+                assert lang.count(n, True) == len(acc)
+                assert lang.count(n, False) == len(c.terminals)**n - len(acc)
+            for _ in range(5):
+                w = lang.sample(n, True)
+                assert (w is None) == (len(acc) == 0)
+                assert w is None or c.contains(w)
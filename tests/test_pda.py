@@ -0,0 +1,50 @@
+import itertools
+import random
+import time
+from pyformlang.pda import PDA, State, StackSymbol, Symbol, Epsilon
+from pyformlang.cfg import Terminal
+from pda import Pda
+
+# epsilon moves can push A or B on top of every symbol -> exponentially many
+# stacks of a bounded height
+EPS_PUSH = [("q","","Z","q",["A","Z"]), ("q","","Z","q",["B","Z"]),
+            ("q","","A","q",["A","A"]), ("q","","A","q",["B","A"]),
+            ("q","","B","q",["A","B"]), ("q","","B","q",["B","B"]),
+            ("q","a","A","q",[]), ("q","","Z","f",["Z"])]
+
+def build(delta, final:list[str]) -> Pda:
+    p = PDA()
+    for src,sym,top,dst,push in delta:
+        p.add_transition(State(src), Symbol(sym) if sym else Epsilon(), StackSymbol(top), State(dst), [StackSymbol(x) for x in push])
+    p.set_start_state(State(delta[0][0]))
+    p.set_start_stack_symbol(StackSymbol("Z"))
+    for f in final:
+        p.add_final_state(State(f))
+    return Pda(p, [], len(final) > 0)
+
+def test_epsilon_push_terminates():
+    start = time.monotonic()
+    final = build(EPS_PUSH, ["f"])
+    assert [final.simulate(w)[0] for w in ["", "a", "aa", "b", "a"*40]] == [True, True, True, False, True]
+    empty = build(EPS_PUSH, [])
+    assert [empty.simulate(w)[0] for w in ["", "a", "aa", "b"]] == [False, False, False, False]
+    assert [s[0] for _,_,s in final.trieResults(3, 0, 8, ["a", "b"])] == [True] + [False]*7
+    assert time.monotonic() - start < 5
+
+def test_random_against_cfg():
+    rnd = random.Random(5)
+    for _ in range(100):
+        nq = rnd.randint(1, 3)
+        delta = [(str(rnd.randrange(nq)), rnd.choice(["a", "b", ""]), rnd.choice("ZAB"), str(rnd.randrange(nq)),
+                  [rnd.choice("ZAB") for _ in range(rnd.choice([0, 0, 1, 1, 2, 3]))]) for _ in range(rnd.randint(1, 8))]
+        delta[0] = ("0",) + delta[0][1:]
+        final = [str(rnd.randrange(nq))] if rnd.random() < .5 else []
+        e = build(delta, final)
+        try:
+            cfg = e.pda.to_empty_stack().to_cfg() if final else e.pda.to_cfg()
+        except IndexError: # pyformlang fails on some of these
+            continue
+        for l in range(4):
+            for w in map("".join, itertools.product("ab", repeat=l)):
+                exp = cfg.contains([Terminal(c) for c in w]) if w else cfg.generate_epsilon()
+                assert e.simulate(w)[0] == exp, (delta, final, w)
@@ -0,0 +1,33 @@
+import multiprocessing
+import random
+from tmLib import NDTM
+
+def randomTm(rnd:random.Random) -> NDTM:
+    tm = NDTM('q0', 'q3', '#')
+    for _ in range(rnd.randint(4, 12)):
+        tm.addTrans('q%d' % rnd.randint(0, 2), (rnd.choice('01#'),), 'q%d' % rnd.randint(0, 3), ((rnd.choice('01#'), rnd.choice('LRS')),))
+    tm.compile()
+    return tm
+
+def outcome(tm:NDTM, w:str) -> tuple:
+    acc = tm.accepts(w)
+    return (None if acc is None else acc.pack(), tm.undecided, tm.explored)
+
+# the parallel search has to explore, accept and run out of budget exactly
+# like the sequential one
+def test_parallel_matches_sequential():
+    rnd = random.Random(7)
+    for _ in range(25):
+        seq = randomTm(rnd)
+        if seq.deterministic:
+            continue
+        par = seq.clone()
+        par.parallel = 3
+        for maxSteps in [5, 17, 300]:
+            for maxFrontier in [None, 2, 5]:
+                for tm in (seq, par):
+                    tm.maxSteps, tm.maxFrontier = maxSteps, maxFrontier
+                for w in ['', '0', '01', '110', '0101']:
+                    assert outcome(seq, w) == outcome(par, w)
+        par.close()
+    assert multiprocessing.active_children() == []
@@ -51,12 +51,14 @@ class Ndtm(Ele):
             print(r"\node[state%s%s] (%s) {%s};" % (accepting,initial,st,st),file=f)
         print("%",file=f)
         # transitions
+        counts = self.profileCounts() if self.ndtm.profile else {}
         for s,movements in self.ndtm.trans.items():
             print("s", s)
             src,read = s
+            heat = (" (%dx)" % counts.get(src + "," + ",".join(read), 0)) if counts else ""
             for dst,out in movements:
                 for write,move in out:
-                    c = (str(read[0])+"/"+str(write)+","+str(move)).replace("#", r"\#")
+                    c = (str(read[0])+"/"+str(write)+","+str(move)+heat).replace("#", r"\#")
                     if src == dst:
                         print(r"\path[->] (%s) edge[loop above] node[] {%s} (%s);" % (src,c,dst), file=f)
                     else:
@@ -64,14 +66,24 @@ class Ndtm(Ele):
         print(r"\end{tikzpicture}" + "\n" + r"\end{document}", file=f)
         return True
 
+    # transitions taken per "state,symbols"
+    def takeProfile(self) -> dict[str,int]:
+        if not self.ndtm.profile:
+            return None
+        return {state + "," + ",".join(read): cnt for (state,read),cnt in self.ndtm.takeProfile().items()}
+
     def toDot(self,fi:str) -> bool:
         print("Ndtm does no toDot")
         return False
 
-    # returns (accepted,return of TM lib,[])
+    # returns (accepted,return of TM lib,stats)
+    # accepted is None if the step/frontier budget was exhausted
     def simulate(self, i:str):
         ret = self.ndtm.accepts(i)
-        return (False if ret is None else True, ret, [])
+        stats = {'explored': self.ndtm.explored}
+        if self.ndtm.undecided:
+            return (None, "undecided", stats)
+        return (False if ret is None else True, ret, stats)
 
     @classmethod
     def loadJflap(cls, path:str):
@@ -128,6 +140,11 @@ class Ndtm(Ele):
             # remove space char from list of terminals
             terminals.remove(space)
 
+            # detects whether there is at most one transition per (state,symbol)
+            ndtm.compile()
+            if verbose >= 1 and ndtm.deterministic:
+                print("TM is deterministic -> simulated on a single configuration")
+
         if 'check' in d and isinstance(d['check'], list):
             for c in d['check']:
                 if not isinstance(c, str):
@@ -25,65 +25,211 @@
 #### 
 
 from collections import defaultdict, deque 
+import multiprocessing
+import weakref
+import zlib
   
+class Alphabet:
+    # Interns the tape symbols to small integer codes (the blank is always 0)
+    # so tapes can be stored as bytearray. Shared by all tapes of a TM.
+    def __init__(self, blank):
+        self.blank = blank
+        self.syms  = [blank]
+        self.codes = {blank: 0}
+
+    # Returns the code of a symbol, interning it if it is new
+    def code(self, symbol):
+        c = self.codes.get(symbol)
+        if c is None:
+            c = len(self.syms)
+            if c > 255:
+                raise ValueError("too many tape symbols (at most 256 are supported)")
+            self.codes[symbol] = c
+            self.syms.append(symbol)
+        return c
+
+    # Encodes a string to a bytearray of codes
+    def encode(self, string):
+        return bytearray(map(self.code, string))
+
+class Fired(list):
+    # Entry of the transition table (used instead of a plain list while
+    # profiling) counting how often one of its transitions is taken
+    def __init__(self, transitions, key):
+        super().__init__(transitions)
+        self.key   = key
+        self.fired = 0
+
+    def __getitem__(self, i):
+        self.fired += 1
+        return list.__getitem__(self, i)
+
 class Tape: 
     # Constructor. Sets the blank symbol, the 
     # string to load and the position of the tape head 
-    def __init__(self, blank, string ='', head = 0): 
+    # The cells are stored in a bytearray with some spare blanks on both sides
+    # (grown by doubling). lo/hi is the part that was written/loaded, nbLo/nbHi
+    # the part between the outermost non-blank symbols and pos is the
+    # absolute position of the head in cells.
+    def __init__(self, blank, string ='', head = 0, alphabet = None): 
         self.blank = blank 
+        self.alphabet = Alphabet(blank) if alphabet is None else alphabet
         self.loadString(string, head) 
       
     # Loads a new string and sets the tape head     
     def loadString(self, string, head): 
-        self.symbols = list(string)
-        self.head = head 
+        self.loadCodes(self.alphabet.encode(string), head)
+
+    # Loads already encoded symbols and sets the tape head
+    def loadCodes(self, data, head):
+        pad = max(16, len(data))
+        self.cells = bytearray(pad) + data + bytearray(pad)
+        self.lo  = pad
+        self.hi  = pad + len(data)
+        self.pos = pad + head
+        self.nbLo, self.nbHi = self.lo, self.hi
+        self.shrink()
+
+    # Symbols of the written/loaded part of the tape
+    @property
+    def symbols(self):
+        syms = self.alphabet.syms
+        return [syms[c] for c in self.cells[self.lo:self.hi]]
+
+    # Position of the head relative to the first written/loaded symbol
+    @property
+    def head(self):
+        return self.pos - self.lo
+
+    # Code of the symbol on the current cell
+    def read(self):
+        if 0 <= self.pos < len(self.cells):
+            return self.cells[self.pos]
+        return 0
+
+    # Writes the code of a symbol in the current cell, growing the cells if
+    # necessary
+    def write(self, code):
+        if self.pos < 0:
+            grow = len(self.cells) - self.pos
+            self.cells[0:0] = bytearray(grow)
+            self.pos += grow
+            self.lo  += grow
+            self.hi  += grow
+            self.nbLo += grow
+            self.nbHi += grow
+        elif self.pos >= len(self.cells):
+            self.cells.extend(bytearray(self.pos + 1))
+        self.cells[self.pos] = code
+        if self.pos < self.lo: self.lo = self.pos
+        if self.pos >= self.hi: self.hi = self.pos + 1
+        if code:
+            if self.nbLo >= self.nbHi:
+                self.nbLo, self.nbHi = self.pos, self.pos + 1
+            elif self.pos < self.nbLo: self.nbLo = self.pos
+            elif self.pos >= self.nbHi: self.nbHi = self.pos + 1
+        elif self.pos == self.nbLo or self.pos == self.nbHi - 1:
+            self.shrink()
+
+    # Moves nbLo/nbHi inwards over blanks
+    def shrink(self):
+        cells = self.cells
+        while self.nbLo < self.nbHi and cells[self.nbLo] == 0: self.nbLo += 1
+        while self.nbHi > self.nbLo and cells[self.nbHi - 1] == 0: self.nbHi -= 1
           
     # Returns the symbol on the current cell, or the blank 
     # if the head is on the start of the infinite blanks 
     def readSymbol(self): 
-        # print(self.head, self.symbols[self.head] if 0 <= self.head < len(self.symbols) else "blank")
-        if 0 <= self.head < len(self.symbols): 
-            return self.symbols[self.head] 
-        else: 
-            return self.blank 
+        return self.alphabet.syms[self.read()]
           
     # Writes a symbol in the current cell, extending 
-    # the list if necessary 
+    # the tape if necessary 
     def writeSymbol(self, symbol): 
-        if 0 <= self.head < len(self.symbols): 
-            self.symbols[self.head] = symbol 
-        elif self.head < 0:
-            self.symbols = [symbol] + self.symbols
-            self.head += 1
-        else: 
-            self.symbols.append(symbol)
+        self.write(self.alphabet.code(symbol))
               
     # Moves the head left (-1), stay (0) or right (1) 
     def moveHead(self, direction): 
         if direction == 'L': inc = -1
         elif direction == 'R': inc = 1
         else: inc = 0
-        self.head+= inc 
+        self.pos += inc 
           
     # Creates a new tape with the same attributes than this 
     def clone(self): 
-        return Tape(self.blank, self.symbols, self.head) 
+        tape = Tape.__new__(Tape)
+        tape.blank    = self.blank
+        tape.alphabet = self.alphabet
+        tape.cells    = self.cells[:]
+        tape.lo, tape.hi, tape.pos = self.lo, self.hi, self.pos
+        tape.nbLo, tape.nbHi = self.nbLo, self.nbHi
+        return tape
+
+    # Like key but for a packed tape (see NDTM.pack)
+    @staticmethod
+    def keyOf(data, head):
+        content = data.lstrip(b'\0')
+        if not content: return (0, b'')
+        return (head - (len(data) - len(content)), content.rstrip(b'\0'))
+
+    # Hashable representation of the content (blanks at the borders are
+    # stripped) and the head position relative to it (a blank tape looks the
+    # same from everywhere)
+    def key(self):
+        if self.nbLo >= self.nbHi: return (0, b'')
+        return (self.pos - self.nbLo, bytes(self.cells[self.nbLo:self.nbHi]))
       
     # String representation of the tape 
     def __str__(self): 
-        return str(self.symbols[:self.head]) + \
-               str(self.symbols[self.head:]) 
+        symbols = self.symbols
+        return str(symbols[:self.head]) + \
+               str(symbols[self.head:]) 
       
   
 class NDTM: 
     # Constructor. Sets the start and final states and 
     # inits the TM tapes 
     def __init__(self, start, final, blank ='#', ntapes = 1): 
+        # states are interned to small integers, self.q is the current one
+        self.states   = []
+        self.stateIdx = {}
         self.start = self.state = start 
         self.final = final 
-        self.tapes = [Tape(blank) for _ in range(ntapes)] 
+        self.alphabet = Alphabet(blank)
+        self.tapes = [Tape(blank, alphabet=self.alphabet) for _ in range(ntapes)] 
         self.trans = defaultdict(list) 
+        # compiled transition table (built by compile, reset by addTrans)
+        self.table = None
+        # budgets of accepts (None -> unlimited), if one is exhausted the
+        # result is undecided
+        self.maxSteps = None
+        self.maxFrontier = None
+        # stats of the last call of accepts
+        self.explored = 0
+        self.undecided = False
+        # amount of worker processes searching nondeterministic TMs (<= 1 ->
+        # sequential search)
+        self.parallel = 0
+        self.search   = None
+        # whether the table entries count the transitions taken (see
+        # enableProfile)
+        self.profile = False
   
+    # Returns the code of a state, interning it if it is new
+    def stateCode(self, state):
+        q = self.stateIdx.get(state)
+        if q is None:
+            q = self.stateIdx[state] = len(self.states)
+            self.states.append(state)
+        return q
+
+    @property
+    def state(self):
+        return self.states[self.q]
+
+    @state.setter
+    def state(self, state):
+        self.q = self.stateCode(state)
+
     # Puts the TM in the start state and loads an input 
     # string into the first tape 
     def restart(self, string): 
@@ -99,6 +245,75 @@ class NDTM:
     # Add an entry to the transaction table 
     def addTrans(self, state, read_sym, new_state, moves): 
         self.trans[(state, read_sym)].append((new_state, moves)) 
+        self.table = None
+
+    # Builds the flat transition table. The entry of state q reading the
+    # codes c_0..c_n-1 is at q*stride + sum(c_i * nsym**i) and holds a list of
+    # (dst, ((writeCode, delta), ...)) with delta in -1/0/+1.
+    def compile(self):
+        deltas = {'L': -1, 'R': 1, 'S': 0}
+        code = self.alphabet.code
+        for (state, read), ts in self.trans.items():
+            self.stateCode(state)
+            for c in read: code(c)
+            for dst, moves in ts:
+                self.stateCode(dst)
+                for symbol, _ in moves: code(symbol)
+        self.finalQ = self.stateCode(self.final)
+        self.nsym   = len(self.alphabet.syms)
+        self.stride = self.nsym ** len(self.tapes)
+        self.table  = [None] * (len(self.states) * self.stride)
+        self.deterministic = all(len(ts) <= 1 for ts in self.trans.values())
+        for (state, read), ts in self.trans.items():
+            idx = self.stateIdx[state] * self.stride
+            for i, c in enumerate(read):
+                idx += code(c) * self.nsym ** i
+            self.table[idx] = [(self.stateIdx[dst], tuple((code(symbol), deltas.get(direction, 0)) for symbol, direction in moves)) for dst, moves in ts]
+            if self.profile:
+                self.table[idx] = Fired(self.table[idx], (state, read))
+
+    # Counts the transitions taken per (state, read symbols) from now on
+    def enableProfile(self):
+        self.profile = True
+        self.table   = None
+
+    # Returns the transitions taken per (state, read symbols) since the last
+    # call and resets them
+    def takeProfile(self) -> dict[tuple,int]:
+        counts = {key: 0 for key in self.trans}
+        for entry in self.table or []:
+            if isinstance(entry, Fired):
+                counts[entry.key] += entry.fired
+                entry.fired = 0
+        return counts
+
+    # Like getTrans but returns the compiled transitions
+    def getCompiled(self):
+        if len(self.tapes) == 1:
+            c = self.tapes[0].read()
+            if c >= self.nsym: return None
+            return self.table[self.q * self.stride + c]
+        idx, f = self.q * self.stride, 1
+        for tape in self.tapes:
+            c = tape.read()
+            if c >= self.nsym: return None
+            idx += c * f
+            f *= self.nsym
+        return self.table[idx]
+
+    # Like execTrans but executes a compiled transition
+    def execCompiled(self, trans):
+        self.q, moves = trans
+        if len(moves) == 1:
+            (w, d), = moves
+            tape = self.tapes[0]
+            tape.write(w)
+            tape.pos += d
+            return self
+        for tape, (w, d) in zip(self.tapes, moves):
+            tape.write(w)
+            tape.pos += d
+        return self
       
     # Returns the transaction that corresponds to the 
     # current state & read symbols, or None if there is not 
@@ -116,35 +331,131 @@ class NDTM:
             tape.moveHead(direction) 
         return self
       
+    # Hashable representation of the configuration
+    def key(self):
+        return (self.q,) + tuple(tape.key() for tape in self.tapes)
+
+    # Picklable representation of the configuration (state, written part of
+    # each tape and the head relative to it)
+    def pack(self):
+        return (self.q, tuple((bytes(t.cells[t.lo:t.hi]), t.pos - t.lo) for t in self.tapes))
+
+    # Returns a copy of the TM in the packed configuration
+    def unpack(self, packed):
+        tm = NDTM.__new__(NDTM)
+        tm.__dict__.update(self.__dict__)
+        tm.q, tapes = packed
+        tm.tapes = []
+        for tape, (data, head) in zip(self.tapes, tapes):
+            tm.tapes.append(Tape(tape.blank, alphabet=tape.alphabet))
+            tm.tapes[-1].loadCodes(bytearray(data), head)
+        return tm
+
     # Returns a copy of the current TM 
     def clone(self): 
-        tm = NDTM(self.start, self.final) 
-        tm.state = self.state 
+        tm = NDTM.__new__(NDTM)
+        tm.__dict__.update(self.__dict__)   # shallow copy (trans, alphabet, ...)
         tm.tapes = [tape.clone() for tape in self.tapes] 
-        tm.trans = self.trans        # shallow copy 
         return tm 
           
     # Simulates the TM computation. Returns the TM that 
     # accepted the input string if any, or None. 
+    # Configurations are only explored once. If the budgets are exhausted
+    # None is returned as well and self.undecided is set.
     def accepts(self, string): 
+        if self.table is None: self.compile()
         self.restart(string) 
+        self.explored = 0
+        self.undecided = False
+        if self.deterministic: return self.runDeterministic()
+        if self.parallel > 1: return self.acceptsParallel()
         queue = deque([self]) 
+        seen = {self.key()}
+        # enqueue configurations not seen before
+        def push(tm):
+            k = tm.key()
+            if k not in seen:
+                seen.add(k)
+                queue.append(tm)
         while len(queue) > 0: 
+            if (self.maxSteps is not None and self.explored >= self.maxSteps) or \
+               (self.maxFrontier is not None and len(queue) > self.maxFrontier):
+                self.undecided = True
+                return None
             tm = queue.popleft() 
-            transitions = tm.getTrans() 
+            self.explored += 1
+            transitions = tm.getCompiled() 
             # print("state:",self.state, "symb:", self.tapes[0].readSymbol(), "\t".join(list(map(str,self.tapes))), transitions)
             if transitions is None: 
                 # there are not transactions. Exit 
                 # if the TM is in the final state 
-                if tm.state == tm.final: return tm 
+                if tm.q == self.finalQ: return tm 
             else: 
                 # If the transaction is not deterministic 
                 # add replicas of the TM to the queue 
-                for trans in transitions[1:]: 
-                    queue.append(tm.clone().execTrans(trans)) 
+                for i in range(1, len(transitions)):
+                    push(tm.clone().execCompiled(transitions[i]))
                 # execute the current transition 
-                queue.append(tm.execTrans(transitions[0])) 
+                push(tm.execCompiled(transitions[0]))
         return None
+
+    # Runs a TM without branching on this single configuration which is
+    # modified in place. Instead of remembering all configurations, loops are
+    # detected by comparing with the configuration after 2^k steps (Brent).
+    # Only if state, length of the content and head relative to it match,
+    # the whole configuration is compared.
+    def runDeterministic(self):
+        table, stride, nsym = self.table, self.stride, self.nsym
+        tape   = self.tapes[0]
+        single = len(self.tapes) == 1
+        limit  = self.maxSteps
+        explored, snapAt = 0, 1
+        snapQ, snapRel, snapLen, snap = -1, 0, 0, None
+        while True:
+            if limit is not None and explored >= limit:
+                self.explored = explored
+                self.undecided = True
+                return None
+            explored += 1
+            if single:
+                c = tape.read()
+                trans = table[self.q * stride + c] if c < nsym else None
+            else:
+                trans = self.getCompiled()
+            if trans is None: break
+            if single:
+                self.q, ((w, d),) = trans[0]
+                tape.write(w)
+                tape.pos += d
+            else:
+                self.execCompiled(trans[0])
+            if explored == snapAt:
+                snapAt *= 2
+                snapQ, snapLen = self.q, tape.nbHi - tape.nbLo
+                snapRel = tape.pos - tape.nbLo if snapLen else 0
+                snap = self.key()
+            elif self.q == snapQ and tape.nbHi - tape.nbLo == snapLen and \
+                 (tape.pos - tape.nbLo if snapLen else 0) == snapRel and self.key() == snap:
+                # back in an earlier configuration -> runs forever
+                self.explored = explored
+                return None
+        self.explored = explored
+        return self if self.q == self.finalQ else None
+
+    # Like accepts but the search is done by ParallelSearch. The budgets are
+    # only checked between the levels of the search.
+    def acceptsParallel(self):
+        if self.search is None:
+            self.search = ParallelSearch(self, self.parallel)
+        acc, self.explored, self.undecided = self.search.run(self.pack(), self.maxSteps, self.maxFrontier)
+        return None if acc is None else self.unpack(acc)
+
+    # Stops the worker processes of acceptsParallel (otherwise done when the
+    # search is garbage collected or at exit)
+    def close(self):
+        if self.search is not None:
+            self.search.close()
+            self.search = None
       
     def __str__(self): 
         out = '' 
@@ -174,6 +485,133 @@ class NDTM:
                     tm.addTrans(state, symbols, new_st, moves) 
         return tm 
       
+# Partition of a configuration key (stable across processes unlike hash)
+def _partition(key, n):
+    return zlib.crc32(repr(key).encode()) % n
+
+# Worker of ParallelSearch owning the seen configurations of partition i.
+# On level it receives the candidate (key, packed configuration, order)
+# triples of the next level, where order is (index of the parent, index of
+# the successor) like the sequential search pushes them, and replies the
+# sorted orders of the configurations not seen before. On expand it gets
+# their indices in the level and expands the ones below limit, it replies
+# (index and packed configuration of the first accepting one or None,
+# candidates of the next level per partition).
+def _searchWorker(tm, n, conn, best):
+    seen, level = set(), []
+    while True:
+        msg = conn.recv()
+        if msg[0] == "stop": return
+        if msg[0] == "reset":
+            seen, level = set(), []
+            continue
+        if msg[0] == "level":
+            level = []
+            for k, packed, order in sorted(msg[1], key=lambda c: c[2]):
+                if k not in seen:
+                    seen.add(k)
+                    level.append((order, packed))
+            conn.send([order for order, _ in level])
+            continue
+        _, idxs, limit = msg
+        buckets = [[] for _ in range(n)]
+        acc = None
+        for j, (idx, (_, packed)) in enumerate(zip(idxs, level)):
+            # configurations after an accepting one of another worker are
+            # not needed
+            if idx >= limit or (j % 256 == 0 and best.value < idx): break
+            cur = tm.unpack(packed)
+            transitions = cur.getCompiled()
+            if transitions is None:
+                if cur.q == tm.finalQ:
+                    acc = (idx, packed)
+                    with best.get_lock(): best.value = min(best.value, idx)
+                    break
+                continue
+            nxt = [cur.clone().execCompiled(t) for t in transitions[1:]]
+            nxt.append(cur.execCompiled(transitions[0]))
+            for s, succ in enumerate(nxt):
+                sk = succ.key()
+                buckets[_partition(sk, n)].append((sk, succ.pack(), (idx, s)))
+        level = []
+        conn.send((acc, buckets))
+
+def _stopWorkers(conns, procs):
+    for conn, proc in zip(conns, procs):
+        if proc.is_alive(): conn.send(("stop",))
+    for proc in procs: proc.join()
+
+class ParallelSearch:
+    # Level synchronous BFS over the configurations of tm with n worker
+    # processes. The configurations are hash partitioned by their key, each
+    # worker deduplicates and expands the ones of its partition and the
+    # successors are routed to their partition for the next level. The
+    # configurations of a level are ordered like the queue of the sequential
+    # search, so the budgets and the accepting configuration are the same.
+    def __init__(self, tm, n):
+        self.n = n
+        self.best = multiprocessing.Value('q', 0)
+        self.conns, self.procs = [], []
+        for _ in range(n):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_searchWorker, args=(tm, n, child, self.best), daemon=True)
+            proc.start()
+            self.conns.append(parent)
+            self.procs.append(proc)
+        # the workers are stopped by close, when the search is garbage
+        # collected or at exit (whatever comes first)
+        self.stop = weakref.finalize(self, _stopWorkers, self.conns, self.procs)
+
+    # Sends the candidates to the workers for deduplication. Returns the
+    # indices of the new configurations per worker and their parents in
+    # level order.
+    def _level(self, frontier):
+        for conn, part in zip(self.conns, frontier):
+            conn.send(("level", part))
+        orders = [conn.recv() for conn in self.conns]
+        level = sorted((order, w, i) for w, os in enumerate(orders) for i, order in enumerate(os))
+        idxs = [[0] * len(os) for os in orders]
+        for j, (_, w, i) in enumerate(level): idxs[w][i] = j
+        return idxs, [order[0] for order, _, _ in level]
+
+    # Returns (accepting packed configuration or None, explored, undecided)
+    def run(self, start, maxSteps, maxFrontier):
+        for conn in self.conns: conn.send(("reset",))
+        frontier = [[] for _ in range(self.n)]
+        k = (start[0],) + tuple(Tape.keyOf(data, head) for data, head in start[1])
+        frontier[_partition(k, self.n)].append((k, start, (0, 0)))
+        idxs, _ = self._level(frontier)
+        size = 1
+        explored = 0
+        while size > 0:
+            limit = size if maxSteps is None else min(size, maxSteps - explored)
+            self.best.value = size
+            for conn, idx in zip(self.conns, idxs): conn.send(("expand", idx, limit))
+            frontier = [[] for _ in range(self.n)]
+            acc = None
+            for conn in self.conns:
+                found, buckets = conn.recv()
+                if found is not None and (acc is None or found[0] < acc[0]): acc = found
+                for part, b in zip(frontier, buckets): part.extend(b)
+            idxs, parents = self._level(frontier)
+            # replays the sequential search over the level: before the j-th
+            # configuration is expanded the queue holds the rest of the level
+            # and the new successors of the ones before it
+            pushed = 0
+            for j in range(size):
+                while pushed < len(parents) and parents[pushed] < j: pushed += 1
+                if (maxSteps is not None and explored + j >= maxSteps) or \
+                   (maxFrontier is not None and size - j + pushed > maxFrontier):
+                    return (None, explored + j, True)
+                if acc is not None and acc[0] == j:
+                    return (acc[1], explored + j + 1, False)
+            explored += size
+            size = len(parents)
+        return (None, explored, False)
+
+    def close(self):
+        self.stop()
+
 if __name__ == '__main__': 
     # Example TM that performs unary complement 
     tm = NDTM('q0', 'q1', '#') 